@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import NumpyGrading
+from Protocol import Kind
+from QuestionBank import build_bank, compile_bank, file_hash
+from Room import render_question
+from tests.fakes import make_room, write_bank
+
+# micro benchmarks for the game's hot functions, no GUI and no network: rooms get a fake host
+# whose network just counts what would be written (tests/fakes.py, shared with the tests).
+#   python -m Benchmark                          # run everything, print a table
+#   python -m Benchmark --save baseline.json     # record a baseline
+#   python -m Benchmark --compare baseline.json  # exit 1 if something got slower than --tolerance
+#   python -m Benchmark --filter grade_round --players 2,100,10000
+
+PLAYERS = (2, 10, 100, 1000, 10000)
+BANK_SIZES = (1000, 100000, 1000000)
+
+
+#===================================================================================================================================
+# TIMING: /////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+# calls fn until min_time has passed (at least 3 times), returns seconds per call (median of the runs)
+def measure(fn, min_time=0.2, max_runs=1000):
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (len(times) < 3 or time.perf_counter() - started < min_time):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def bench_room_functions(players, min_time, bank, rng):
+    results = {}
+    for n in players:
+        room = make_room(n, bank, rng)
+        feedback = room.grade_round(0)
+        board = room.scoreboard(room.scores)
+        frame = room.board.update(room.scores)  # what a round really sends next to the feedback
+
+        # grade_round changes the scores, thats fine, only the sorted updates are timed
+        room.vector_grading = False
+        results[f"grade_round[{n}]"] = measure(lambda: room.grade_round(0), min_time=min_time)
+        if NumpyGrading.enabled(n):
+            room.vector_grading = True
+            results[f"grade_round_numpy[{n}]"] = measure(lambda: room.grade_round(0), min_time=min_time)
+        results[f"scoreboard[{n}]"] = measure(lambda: room.scoreboard(room.scores), min_time=min_time)
+        results[f"board_update[{n}]"] = measure(lambda: room.board.update(room.scores), min_time=min_time)
+        results[f"display_results[{n}]"] = measure(lambda: room.display_results(room.all_time_scores), min_time=min_time)
+        results[f"display_results_top[{n}]"] = measure(lambda: room.display_results(room.all_time_scores, 10), min_time=min_time)
+        results[f"broadcast[{n}]"] = measure(lambda: room.broadcast(board, Kind.SCOREBOARD), min_time=min_time)
+        results[f"broadcast_frame_personal[{n}]"] = measure(lambda: room.broadcast_frame(frame, feedback), min_time=min_time)
+    return results
+
+
+def bench_questions(min_time, bank):
+    room = make_room(2, bank, random.Random(0))
+    i = iter(range(10 ** 9))
+    return {
+        "display_question": measure(lambda: room.display_question(5, 1), min_time=min_time),
+        "question_frame_cached": measure(lambda: room.question_frame(5, 1), min_time=min_time),
+        # a different question every call, so every call renders
+        "question_frame_uncached": measure(lambda: room.question_frame(next(i) % len(bank), 1), min_time=min_time),
+    }
+
+
+def bench_banks(sizes, min_time, workdir):
+    results = {}
+    for n in sizes:
+        path = os.path.join(workdir, f"bank{n}.txt")
+        write_bank(path, n)
+        stat = os.stat(path)
+        sha = file_hash(path)
+
+        def compile_once():
+            with open(os.devnull, "wb") as out:
+                compile_bank(path, out, stat, sha)
+
+        results[f"compile_bank[{n}]"] = measure(compile_once, min_time=min_time, max_runs=5)
+        build_bank(path)  # leaves the sidecar
+        results[f"load_bank_cached[{n}]"] = measure(lambda: build_bank(path), min_time=min_time)
+        bank = build_bank(path)
+        results[f"bank_getitem[{n}]"] = measure(lambda: bank[n // 2], min_time=min_time)
+    return results
+
+
+#===================================================================================================================================
+# REPORT: /////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+def fmt(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.2f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds:9.2f} s "
+
+
+# prints the table, returns the names that got slower than tolerance x baseline
+def print_results(results, baseline=None, tolerance=1.25, out=sys.stdout):
+    slower = []
+    width = max(len(name) for name in results)
+    for name, seconds in results.items():
+        line = f"{name:<{width}}  {fmt(seconds)}"
+        if baseline and name in baseline:
+            ratio = seconds / baseline[name] if baseline[name] else float("inf")
+            line += f"   {ratio:5.2f}x baseline"
+            if ratio > tolerance:
+                line += "  <-- slower"
+                slower.append(name)
+        out.write(line + "\n")
+    return slower
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m Benchmark", description="micro benchmarks for the SUquid Quiz server")
+    parser.add_argument("--players", default=",".join(map(str, PLAYERS)), help="room sizes, comma separated")
+    parser.add_argument("--banks", default=",".join(map(str, BANK_SIZES)), help="question bank sizes, comma separated")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend on each benchmark (default 0.2)")
+    parser.add_argument("--save", help="write the results to this json file (a baseline)")
+    parser.add_argument("--compare", help="baseline json to compare with")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="slower than baseline x this counts as a regression")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    players = [int(n) for n in args.players.split(",") if n]
+    banks = [int(n) for n in args.banks.split(",") if n]
+    wanted = lambda group: not args.filter or any(args.filter in name for name in group)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "questions.txt")
+        write_bank(path, 1000)
+        bank = build_bank(path)
+        render_question.cache_clear()
+
+        if wanted(["grade_round", "scoreboard", "board_update", "display_results", "broadcast"]):
+            results.update(bench_room_functions(players, args.min_time, bank, random.Random(0)))
+        if wanted(["display_question", "question_frame"]):
+            results.update(bench_questions(args.min_time, bank))
+        if wanted(["compile_bank", "load_bank", "bank_getitem"]):
+            results.update(bench_banks(banks, args.min_time, workdir))
+
+    if args.filter:
+        results = {name: s for name, s in results.items() if args.filter in name}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+
+    slower = print_results(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({"python": sys.version.split()[0], "results": results}, file, indent=2)
+
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+from Protocol import Kind, encode_frame
+
+# shared by Room.py and the clients (ClientNetwork.py, LoadTest.py)
+#
+# the scoreboard (top of the table + how many players there are) goes out as a versioned stream
+# instead of the whole board after every round: a client gets a snapshot when it joins or resumes
+# and after that only what changed, so a round where 3 of the top 10 moved costs 3 lines, not 10.
+# every BOARD payload is text:
+#   "S <seq> <players>"  snapshot, followed by every entry on the board
+#   "D <seq> <players>"  delta on top of seq - 1, followed by the entries that changed
+# entries are "<rank> <score> <username>" (the name last, it can have spaces, never a newline:
+# Engine.admit turns those away), a player that fell off the board is "- <username>". a client
+# that sees a delta it cant apply (it missed one, the server coalesces boards for slow clients)
+# sends RESYNC and gets a snapshot back.
+
+SNAPSHOT = "S"
+DELTA = "D"
+
+# BoardModel.apply results
+APPLIED = "applied"  # the board changed (or a round went by without changes)
+STALE = "stale"      # nothing to do, already seen or a resync is on its way
+GAP = "gap"          # missed something, send RESYNC
+
+
+def entry_line(username, rank, score):
+    return f"{rank} {score} {username}"
+
+
+# raises ValueError if the header is broken, an entry line that doesnt parse is skipped (one
+# bad line shouldnt cost the whole board, the server doesnt let control characters into names).
+# returns (mode, seq, players, {username: (rank, score)}, [usernames that left the board])
+def parse_board(payload):
+    lines = payload.split("\n")
+    mode, seq, players = lines[0].split(" ")
+    if mode not in (SNAPSHOT, DELTA):
+        raise ValueError(f"unknown board mode {mode!r}")
+    entries = {}
+    removed = []
+    for line in lines[1:]:
+        if line.startswith("- "):
+            removed.append(line[2:])
+            continue
+        rank, _, rest = line.partition(" ")
+        score, _, username = rest.partition(" ")
+        if rank.isdigit() and score.lstrip("-").isdigit() and username:
+            entries[username] = (int(rank), int(score))
+    return mode, int(seq), int(players), entries, removed
+
+
+#===================================================================================================================================
+# SERVER SIDE: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+# what the room last told its players. not thread safe, the room uses it under its lock
+# (and sends snapshots under it too, so no delta computed after a snapshot can overtake it)
+class BoardFeed:
+    def __init__(self, limit):
+        self.limit = limit
+        self.seq = 0
+        self.view = {}  # {username: (rank, score)} as of seq
+        self.players = 0
+
+    # moves the view to the current scores: returns the encoded delta frame (sent even when
+    # nothing changed, the client sees the round went by and the seq stays without holes)
+    def update(self, scores):
+        view = {username: (rank, score) for rank, username, score in scores.ranked(self.limit)}
+        old = self.view
+        lines = [f"{DELTA} {self.seq + 1} {len(scores)}"]
+        lines += [entry_line(username, *entry) for username, entry in view.items() if old.get(username) != entry]
+        lines += [f"- {username}" for username in old if username not in view]
+        self.seq += 1
+        self.view = view
+        self.players = len(scores)
+        return encode_frame(Kind.BOARD, "\n".join(lines))
+
+    # the whole board as of seq
+    def snapshot(self):
+        lines = [f"{SNAPSHOT} {self.seq} {self.players}"]
+        lines += [entry_line(username, *entry) for username, entry in self.view.items()]
+        return encode_frame(Kind.BOARD, "\n".join(lines))
+
+
+#===================================================================================================================================
+# CLIENT SIDE: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+# the client's copy of the board. one per connection: a new connection starts empty and gets a snapshot
+class BoardModel:
+    def __init__(self):
+        self.seq = None     # None until the first snapshot
+        self.entries = {}   # {username: (rank, score)}
+        self.players = 0
+        self.resyncing = False  # asked for a snapshot, deltas until then are ignored
+
+    # returns APPLIED, STALE or GAP (GAP only once per resync). raises ValueError if the payload is broken
+    def apply(self, payload):
+        mode, seq, players, entries, removed = parse_board(payload)
+        if mode == SNAPSHOT:
+            self.seq, self.entries, self.players = seq, entries, players
+            self.resyncing = False
+            return APPLIED
+
+        if self.seq is not None and seq <= self.seq:
+            return STALE  # older than the snapshot we have
+        if self.seq is None or seq != self.seq + 1:
+            if self.resyncing:
+                return STALE
+            self.resyncing = True
+            return GAP
+
+        for username in removed:
+            self.entries.pop(username, None)
+        self.entries.update(entries)
+        self.seq, self.players = seq, players
+        return APPLIED
+
+    # the board as text, best first
+    def lines(self):
+        lines = ["===== SCOREBOARD ====="]
+        if not self.entries:
+            lines.append("No scores to display.")
+        else:
+            for username, (rank, score) in sorted(self.entries.items(), key=lambda item: (item[1][0], item[0])):
+                lines.append(f"{rank:>3}. {username:<15} : {score}")
+            if self.players > len(self.entries):
+                lines.append(f"... and {self.players - len(self.entries)} more")
+        lines.append("======================")
+        return lines
@@ -1,11 +1,13 @@
 import tkinter as tk
 from tkinter import messagebox, scrolledtext
- 
-import socket
-import threading
+
+from ClientNetwork import CONNECTED, DISCONNECTED, FRAME, RECONNECTING, QuizConnection
+from Protocol import Kind
 
 bg_color = "#F3B9DF" # background and foreground colors for the GUI 
 fg_color = "black"
+FRAME_MS = 16 # the window checks for what came from the server once per frame (~60 fps)
+MAX_HISTORY = 2000 # lines kept in the message list, older ones are dropped so long games stay fast
 
 
 class SUquidQuizClient:
@@ -15,14 +17,19 @@ class SUquidQuizClient:
         self.master.title("SUquid Quiz Client")
         self.master.configure(bg=bg_color)
 
-        self.client_socket = None #tcp socket obj
-        self.is_connected = False # connection status flag  to controlthreads
-        self.rec_thread = None #bgtread for recieving thread
+        self.connection = None # QuizConnection (ClientNetwork.py) while connecting / connected / reconnecting
+        self.server_details = None # (ip, port, room, username) of the current connection
+        self.can_answer = False # a question is open and we havent answered it yet
+        self.seconds_left = 0 # countdown for the current question, corrected by every TIMER from the server
+        self.countdown_job = None # pending master.after id of the countdown
+        self.session = None # (ip, port, room, username, token) from the server, lets a reconnect resume the game
 
         self.answer_var = tk.StringVar(value="") # tkinter variable to hold selected answer from radio buttons
 
         self.create_widgets()
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing) # handle window close event, so socket closes
+        self.poll_job = None # pending master.after id of poll_connection
+        self.poll_connection()
 
     #### GUI Setup and Layout
 
@@ -43,6 +50,10 @@ class SUquidQuizClient:
         self.username_entry = tk.Entry(conn_frame)
         self.username_entry.grid(row=0, column=5)
 
+        tk.Label(conn_frame, text="Room:", bg=bg_color, fg=fg_color).grid(row=0, column=6) # optional, empty = default room
+        self.room_entry = tk.Entry(conn_frame, width=10)
+        self.room_entry.grid(row=0, column=7)
+
         self.connect_button = tk.Button(self.master, text="Connect", command=self.toggle_connection)
         self.connect_button.grid(row=1, column=0, columnspan=6, pady=5)
 
@@ -60,6 +71,9 @@ class SUquidQuizClient:
                                        command=self.submit_answer, state=tk.DISABLED) #disabled until recieve question, prevents invalid submission
         self.submit_button.grid(row=3, column=0, columnspan=6, pady=5)
 
+        self.timer_label = tk.Label(self.master, text="", bg=bg_color, fg=fg_color) # time left, empty when no time limit
+        self.timer_label.grid(row=3, column=6, columnspan=2)
+
         # message display frame containing a scrollable listbox 
         frame = tk.Frame(self.master, bg=bg_color)
         frame.grid(row=4, column=0, columnspan=6, padx=10, pady=10, sticky="nsew")
@@ -77,7 +91,7 @@ class SUquidQuizClient:
 
     # connect or disconnect based on current state
     def toggle_connection(self): 
-        if self.is_connected:
+        if self.connection is not None:
             self.disconnect()
         else:
             self.connect()
@@ -87,6 +101,7 @@ class SUquidQuizClient:
         ip = self.ip_entry.get().strip() 
         port = self.port_entry.get().strip()
         username = self.username_entry.get().strip()
+        room = self.room_entry.get().strip()
 
         if not ip or not port or not username: # check all fields are filled
             messagebox.showerror("Error", "All fields are required.")
@@ -95,59 +110,135 @@ class SUquidQuizClient:
 
         try:
             port = int(port)
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # creates TCP socket 
-            self.client_socket.connect((ip, port))
-            self.client_socket.sendall(username.encode())
-
-        except (socket.error, ValueError) as e:
+        except ValueError as e:
             messagebox.showerror("Connection Failed", str(e))
             self.insert_msg_to_listbox(f"Could not connect: {e}")
             return
 
-        self.is_connected = True
-        self.connect_button.config(text="Disconnect")
-        self.insert_msg_to_listbox(f"Connected to {ip}:{port} as {username}")
+        # same server / room / name as before a dropped connection: resume the game instead of joining
+        token = None
+        if self.session is not None and self.session[:4] == (ip, port, room, username):
+            token = self.session[4]
+        else:
+            self.session = None
 
-        self.rec_thread = threading.Thread(target=self.receive_messages, daemon=True)
-        self.rec_thread.start() #creates bg thread to handle incoming messages  and prevent freezing GUI
-        #daemon automatically terminates thread when main program exits
+        # connecting happens on the connection's own thread, the window stays responsive
+        connection = QuizConnection(ip, port, username, room, token)
+        self.connection = connection
+        self.server_details = (ip, port, room, username) # the session token that comes back belongs to these
+        self.connect_button.config(text="Disconnect")
+        self.insert_msg_to_listbox(f"Connecting to {ip}:{port}...")
+        connection.start()
 
     def disconnect(self):
-        if self.is_connected:
-            self.is_connected = False # stops recieving loop
-            self.client_socket.close()
-            self.submit_button.config(state=tk.DISABLED)
+        if self.connection is not None:
+            self.connection.close() # its remaining events are ignored, see apply_events
+            self.connection = None
+            self.connection_lost()
             self.connect_button.config(text="Connect")  #restores UI to intial state
             self.insert_msg_to_listbox("Disconnected from server")
 
+    # no connection right now (left, or waiting to reconnect)
+    def connection_lost(self):
+        self.can_answer = False
+        self.submit_button.config(state=tk.DISABLED)
+        self.stop_countdown()
+
     #### Receiving and Processing Messages
 
-    def receive_messages(self):
-        while self.is_connected: # loop to continuously receive messages from server as long as conneceted
-            try:
-                message = self.client_socket.recv(4096) #reads up to 4096 bytes from socket
-                if not message:  # server has closed the connection
-                    self.master.after(0, self.disconnect)
-                    break
+    # the connection's thread never calls tkinter (not even after()), the window picks up what it
+    # queued from here, on the main thread
+    def poll_connection(self):
+        connection = self.connection
+        if connection is not None and connection.events:
+            self.apply_events(connection)
+        self.poll_job = self.master.after(FRAME_MS, self.poll_connection)
+
+    # runs on the main thread, at most once per FRAME_MS: everything the connection reported since
+    # the last time, shown with one listbox update
+    def apply_events(self, connection):
+        events = connection.drain()
+        if connection is not self.connection:
+            return # the player already disconnected this one
+
+        lines = []
+        for event in events:
+            if event[0] == FRAME:
+                self.process_server_messages(event[1], event[2], lines)
+            elif event[0] == CONNECTED:
+                ip, port, room, username = self.server_details
+                if event[1]:
+                    lines.append(f"Connected to {ip}:{port}, resuming the game as {username}")
+                else:
+                    lines.append(f"Connected to {ip}:{port} as {username}" + (f" in room {room}" if room else ""))
+            elif event[0] == RECONNECTING:
+                self.connection_lost()
+                lines.append(event[1])
+            elif event[0] == DISCONNECTED:
+                self.connection = None
+                self.connection_lost()
+                self.connect_button.config(text="Connect")
+                lines.append(event[1])
+                if event[2]: # the first connect didnt work
+                    self.show_lines(lines)
+                    messagebox.showerror("Connection Failed", event[1])
+                    return
+        self.show_lines(lines)
+
+    # lines: what to add to the message list
+    def process_server_messages(self, kind, msg, lines): #euns on main thread to safely update GUI
+        if not msg.strip(): # ignore empty messages
+            return
 
-                msg = message.decode(errors="ignore")
-                self.master.after(0, self.process_server_messages, msg)
+        if kind == Kind.SESSION: # not printed, kept for resuming after a dropped connection
+            self.session = (*self.server_details, msg.strip())
+            return
 
-            except (socket.error, OSError): #catches network failure, client unplugged from wifi, server crashes
-                self.master.after(0, self.disconnect)
-                break
+        if kind == Kind.RESULTS: # game over, nothing left to resume
+            self.session = None
 
-    def process_server_messages(self, msg): #euns on main thread to safely update GUI
-        if not msg.strip(): # ignore empty messages
+        if kind == Kind.TIMER: # not printed, just restarts the countdown from what the server says
+            try:
+                self.start_countdown(int(msg))
+            except ValueError:
+                pass
             return
 
-        for line in msg.split("\n"): # display the server message line by line for clean structure
-            self.insert_msg_to_listbox(line)
+        if kind in (Kind.FEEDBACK, Kind.RESULTS): # round is over (a BOARD can also come after a resync, that doesnt end anything)
+            self.stop_countdown()
+            self.can_answer = False
+
+        lines.extend(msg.split("\n")) # display the server message line by line for clean structure
 
-        if "Question" in msg: #enable answer submission when question is received
+        if kind == Kind.QUESTION: #enable answer submission when question is received
             self.answer_var.set("")
-            self.submit_button.config(state=tk.NORMAL)
-            self.insert_msg_to_listbox("Select an option and submit to answer the question")
+            self.can_answer = True
+            lines.append("Select an option and submit to answer the question")
+
+        self.submit_button.config(state=tk.NORMAL if self.can_answer else tk.DISABLED)
+
+    #### Countdown
+
+    # the server only pushes the time every few seconds, count down locally in between
+    def start_countdown(self, seconds):
+        self.stop_countdown()
+        self.seconds_left = seconds
+        self.countdown()
+
+    def countdown(self):
+        if self.seconds_left <= 0:
+            self.timer_label.config(text="Time is up!")
+            self.countdown_job = None
+            return
+        self.timer_label.config(text=f"Time left: {self.seconds_left}s")
+        self.seconds_left -= 1
+        self.countdown_job = self.master.after(1000, self.countdown)
+
+    def stop_countdown(self):
+        if self.countdown_job is not None:
+            self.master.after_cancel(self.countdown_job)
+            self.countdown_job = None
+        self.timer_label.config(text="")
 
     #### Sending Answers to Server
 
@@ -160,21 +251,31 @@ class SUquidQuizClient:
             self.insert_msg_to_listbox("Must select an answer before submitting")
             return
 
-        try:
-            self.client_socket.sendall(answer.encode())
+        if self.connection is not None and self.connection.send(Kind.ANSWER, answer):
+            self.can_answer = False
             self.submit_button.config(state=tk.DISABLED) # disable submit button until next question, prevents double submissions
             self.insert_msg_to_listbox(f"Your answer '{answer}' was submitted")
-        except:
-            self.disconnect()
+        else:
+            self.insert_msg_to_listbox("Not connected right now, answer not sent")
 
     #### diaplay in listbox
     def insert_msg_to_listbox(self, msg):
-        self.msg_listbox.insert(tk.END, msg)
+        self.show_lines([msg])
+
+    def show_lines(self, lines):
+        if not lines:
+            return
+        self.msg_listbox.insert(tk.END, *lines)
+        extra = self.msg_listbox.size() - MAX_HISTORY
+        if extra > 0:
+            self.msg_listbox.delete(0, extra - 1) # oldest lines go
         self.msg_listbox.yview(tk.END)
 
     def on_closing(self):# handle window close event
-        if self.is_connected:
+        if self.connection is not None:
             self.disconnect()
+        if self.poll_job is not None:
+            self.master.after_cancel(self.poll_job)
         self.master.destroy()
 
 
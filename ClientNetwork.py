@@ -0,0 +1,191 @@
+import asyncio
+import random
+import threading
+from collections import deque
+
+from BoardStream import APPLIED, GAP, BoardModel
+from Protocol import FrameDecoder, Kind, ProtocolError, encode_frame, join_payload, resume_payload
+
+# the client's side of the connection, no tkinter in here.
+# everything runs on an asyncio loop in a background thread, so a slow or dead server never
+# freezes the window: connecting has a timeout, and a connection that drops in the middle of a
+# game is reopened with backoff and resumed with the session token (RESUME) the server gave us.
+# what happens is queued as events and the window drains the queue from its own thread (drain(),
+# it polls for them), nothing here calls back into the window.
+# the scoreboard arrives as snapshot + deltas (BoardStream.py), the loop keeps the board and
+# asks for a new snapshot when it missed a delta, the window only ever gets the whole board.
+
+CONNECT_TIMEOUT = 5.0     # seconds to wait for the server to accept the TCP connection
+RECONNECT_DELAY = 0.5     # first retry after a dropped connection, doubled every attempt...
+RECONNECT_MAX_DELAY = 8.0 # ...up to this
+RECONNECT_ATTEMPTS = 8    # then give up (about as long as the server keeps a dropped player, see --resume-grace)
+
+# events: (CONNECTED, resumed), (FRAME, kind, payload), (RECONNECTING, message), (DISCONNECTED, message, failed)
+# failed = the very first connect didnt work. DISCONNECTED is always the last event.
+# a BOARD frame's payload is the scoreboard as text (already put together from the deltas)
+CONNECTED = "connected"
+FRAME = "frame"
+RECONNECTING = "reconnecting"
+DISCONNECTED = "disconnected"
+
+
+class QuizConnection:
+    # token: session token from an earlier connection to the same server / room / name (sends RESUME)
+    def __init__(self, host, port, username, room="", token=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.room = room
+        self.token = token
+
+        self.events = deque()  # appended on the loop thread, popped on the window's (deque is safe for that)
+        self.closed = False    # close() was called
+        self.loop = None
+        self.stop = None       # asyncio.Event, set by close()
+        self.writer = None     # StreamWriter of the open connection, None between connections
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.main()), name="quiz-client", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+#===================================================================================================================================
+# CALLED BY THE WINDOW (any thread): //////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # everything that happened since the last call, in order
+    def drain(self):
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    # returns False if there is no connection right now (dropped / reconnecting)
+    def send(self, kind, payload):
+        loop, writer = self.loop, self.writer
+        if loop is None or writer is None:
+            return False
+        loop.call_soon_threadsafe(self.write, writer, encode_frame(kind, payload))
+        return True
+
+    def close(self):
+        self.closed = True
+        loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self.shutdown)
+            except RuntimeError:
+                pass  # loop already finished
+
+#===================================================================================================================================
+# THE LOOP: ///////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    def post(self, *event):
+        self.events.append(event)
+
+    def write(self, writer, frame):
+        if writer is self.writer and not writer.is_closing():
+            writer.write(frame)
+
+    def shutdown(self):
+        self.stop.set()
+        if self.writer is not None:
+            self.writer.close()
+
+    async def main(self):
+        self.stop = asyncio.Event()
+        self.loop = asyncio.get_running_loop()  # close() can reach us from here on
+        if self.closed:
+            self.post(DISCONNECTED, "Disconnected from server", False)
+            return
+
+        attempt = 0
+        connected_once = False
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError) as e:
+                error = str(e) or "timed out"
+                if not connected_once:
+                    self.post(DISCONNECTED, f"Could not connect: {error}", True)
+                    return
+            else:
+                connected_once = True
+                retry, welcomed = await self.play(reader, writer)
+                if welcomed:
+                    attempt = 0
+                if not retry:
+                    self.post(DISCONNECTED, "Disconnected from server", False)
+                    return
+
+            if self.closed:
+                self.post(DISCONNECTED, "Disconnected from server", False)
+                return
+            attempt += 1
+            if attempt > RECONNECT_ATTEMPTS:
+                self.post(DISCONNECTED, "Lost connection to the server, gave up reconnecting", False)
+                return
+
+            delay = min(RECONNECT_MAX_DELAY, RECONNECT_DELAY * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+            self.post(RECONNECTING, f"Connection lost, reconnecting in {delay:.1f}s ({attempt}/{RECONNECT_ATTEMPTS})")
+            try:
+                await asyncio.wait_for(self.stop.wait(), delay)
+            except asyncio.TimeoutError:
+                continue
+            self.post(DISCONNECTED, "Disconnected from server", False)
+            return
+
+    # one connection: says who we are, then reads until it closes.
+    # returns (reconnect?, did the server accept us?)
+    async def play(self, reader, writer):
+        if self.closed:
+            writer.close()
+            return False, False
+
+        resumed = self.token is not None
+        if resumed:
+            writer.write(encode_frame(Kind.RESUME, resume_payload(self.username, self.token, self.room)))
+        else:
+            writer.write(encode_frame(Kind.JOIN, join_payload(self.username, self.room)))
+        self.writer = writer
+        self.post(CONNECTED, resumed)
+
+        decoder = FrameDecoder()
+        board = BoardModel()  # the server sends a snapshot first on every connection
+        last = None
+        welcomed = False
+        game_over = False
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                for kind, payload in decoder.feed(data):
+                    if kind == Kind.BOARD:
+                        try:
+                            applied = board.apply(payload)
+                        except ValueError:
+                            continue
+                        if applied == GAP:
+                            writer.write(encode_frame(Kind.RESYNC, ""))
+                        # an empty board (a lobby) isnt worth showing
+                        if applied != APPLIED or not board.players:
+                            continue
+                        payload = "\n".join(board.lines())
+                    elif kind == Kind.SESSION:
+                        self.token = payload.strip()
+                        welcomed = True
+                    elif kind == Kind.INFO and payload.startswith("Welcome"):
+                        welcomed = True  # a resume only gets "Welcome back", the token stays the same
+                    elif kind == Kind.RESULTS:
+                        self.token = None  # game over, nothing left to resume
+                        game_over = True
+                    last = kind
+                    self.post(FRAME, kind, payload)
+        except (OSError, ProtocolError):
+            pass
+        finally:
+            self.writer = None
+            writer.close()
+
+        # no point retrying if we left, were turned away or the game is over
+        retry = not (self.closed or last == Kind.ERROR or game_over)
+        return retry, welcomed
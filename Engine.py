@@ -0,0 +1,390 @@
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from LogSink import DEBUG, INFO, LogSink
+from Metrics import ServerMetrics
+from Network import ACCEPT_BATCH, DEFAULT_HIGH_WATER, NetworkCore
+from Protocol import DEFAULT_ROOM, FrameDecoder, Kind, ProtocolError, encode_frame, parse_join, parse_resume
+from QuestionBank import QuestionError
+from Room import RESUME_GRACE, GameRoom
+
+# no tkinter in here: this is the whole server without a window, the GUI (Server.py) and the
+# headless CLI (Headless.py) both drive it and get told what happens through a ServerUI.
+
+MAX_RUNNING_GAMES = 256 # games (rooms) that can be played at the same time, each one uses a pool thread
+MIN_PLAYERS = 2
+MAX_QUESTIONS = 100
+LISTEN_BACKLOG = 1024   # connections the kernel queues for us (capped by net.core.somaxconn)
+HANDSHAKE_TIMEOUT = 5.0 # seconds a new connection gets to send its JOIN / RESUME
+
+
+# what the server tells its front end. headless prints the log, the GUI reads it from the
+# server's LogSink ring buffer instead (from its own thread).
+class ServerUI:
+    # only gets lines at or above the sink's level
+    def log_message(self, message):
+        pass
+
+    # players joined / left a room, or a game started / ended in it
+    def room_changed(self, room):
+        pass
+
+
+# handler of a connection that hasnt sent its first frame yet. lives on the network loop like
+# a room does, so a client that connects and says nothing only costs a timer
+class Handshake:
+    __slots__ = ("server", "address", "timer", "done")
+
+    def __init__(self, server, address):
+        self.server = server
+        self.address = address
+        self.timer = None
+        self.done = False
+
+    def handle_frame(self, client_socket, kind, payload, arrived):
+        if self.done:
+            return
+        self.done = True
+        self.timer.cancel()
+        self.server.admit(client_socket, self.address, kind, payload)
+
+    def handle_disconnect(self, client_socket):
+        self.done = True
+        self.timer.cancel()
+        self.server.network.close_client(client_socket)
+
+    # timer: never said who it is
+    def expire(self, client_socket):
+        if self.done:
+            return
+        self.done = True
+        self.server.metrics.handshake_timeouts.inc()
+        self.server.reject_client(client_socket, "ERROR: no JOIN received in time")
+
+
+# start_room input was wrong, title + message are meant to be shown to whoever started it
+class SetupError(Exception):
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+
+
+class QuizServer:
+    # trace_dir: write a Chrome trace of every game there, profile: cProfile every game thread
+    # (dumped in trace_dir, or the current folder). log: a LogSink (level, ring buffer, json file)
+    # results: a ResultsStore every game is saved to (None = games are forgotten when they end),
+    # the front end opens and closes it. resume_grace: seconds a player who dropped mid game can
+    # RESUME with their session token (0 = dropping out of a game is final)
+    # backlog: listen() backlog, handshake_timeout: seconds a new connection gets to send JOIN / RESUME,
+    # accept_batch: connections accepted per wakeup
+    def __init__(self, ui=None, min_players=MIN_PLAYERS, max_questions=MAX_QUESTIONS,
+                 high_water=DEFAULT_HIGH_WATER, slow_policy="coalesce", trace_dir=None, profile=False, log=None,
+                 results=None, resume_grace=RESUME_GRACE, backlog=LISTEN_BACKLOG, handshake_timeout=HANDSHAKE_TIMEOUT,
+                 accept_batch=ACCEPT_BATCH):
+        self.ui = ui or ServerUI()
+        self.log = log or LogSink()
+        self.results = results
+        self.resume_grace = resume_grace
+        self.min_players = min_players
+        self.max_questions = max_questions
+        self.trace_dir = trace_dir
+        self.profile = profile
+        self.backlog = backlog
+        self.handshake_timeout = handshake_timeout
+        self.accept_batch = accept_batch
+
+        self.server_socket = None
+        self.is_listening = False
+        self.accepting_clients = False
+        self.stopped = threading.Event() # set by stop(), front ends can wait on it
+
+        # every game lives in its own room (Room.py), players pick one by code when they join
+        self.rooms = {}  # {room code: GameRoom}
+        self.rooms_lock = threading.RLock() # network thread creates rooms, UI / game threads read & remove them
+        self.held = threading.local()  # held.changed: rooms to tell the ui about once rooms_lock is released (see tell_ui)
+        self.game_pool = ThreadPoolExecutor(max_workers=MAX_RUNNING_GAMES, thread_name_prefix="room")
+
+        # counters / timings for the whole server (Metrics.py), the front end decides how to export them
+        self.metrics = ServerMetrics()
+        self.metrics.players.fn = lambda: sum(len(room.players) for room in self.all_rooms())
+        self.metrics.rooms.fn = lambda: len(self.rooms)
+        self.metrics.games_running.fn = lambda: sum(1 for room in self.all_rooms() if room.game_started)
+
+        self.network = NetworkCore(high_water, slow_policy, self.metrics) # one select loop reading every client socket (Network.py)
+
+        # set when this server is one worker of a Supervisor.py group: a ShardRouter (Sharding.py)
+        # that knows which worker owns which room and hands clients over to it
+        self.router = None
+
+#=================================================================================================================================
+# STARTING & STOPPING SERVER: ////////////////////////////////////////////////////////////////////////////////////////////////////
+#=================================================================================================================================
+    # creates the server socket and starts listening for new clients, raises OSError if it cant
+    # reuse_port: several processes listen on the same port (SO_REUSEPORT, the kernel spreads the
+    # connections), listen_socket: accept on a socket someone else already set up (port / host ignored)
+    def start(self, port, host="0.0.0.0", reuse_port=False, listen_socket=None):
+        if listen_socket is not None:
+            self.server_socket = listen_socket
+        else:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                if reuse_port:
+                    self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                self.server_socket.bind((host, port))
+                self.server_socket.listen(self.backlog)
+            except OSError:
+                self.server_socket.close()
+                self.server_socket = None
+                raise
+
+        self.is_listening = True
+        self.accepting_clients = True
+        self.stopped.clear()
+        self.network.start()
+        # no accept thread: the network loop accepts (in batches) and runs the handshakes
+        self.network.listen(self.server_socket, self.accept_client, self.accept_batch)
+
+    # the port we actually got (useful with port 0)
+    def port(self):
+        return self.server_socket.getsockname()[1]
+
+    # stops listening and disconnects all clients
+    def stop(self, message=None):
+        if not self.is_listening:
+            return
+        self.is_listening = False
+        self.accepting_clients = False
+        for room in self.all_rooms():
+            if message:
+                room.broadcast(message)
+            room.remove_all("server stopped")
+            self.room_changed(room)
+
+        self.network.stop()
+        self.server_socket.close()
+        self.log_message("--- Server stopped ---")
+        self.log.flush()
+        self.stopped.set()
+
+#===================================================================================================================================
+# HANDLING CONNECTIONS: ///////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # network thread: a new connection, its first frame must be JOIN with its username or RESUME
+    # with its session token, everything else about it waits until that arrives
+    def accept_client(self, client_socket, client_address, decoder=None, frames=()):
+        greeter = Handshake(self, client_address)
+        greeter.timer = self.network.call_later(self.handshake_timeout, greeter.expire, client_socket)
+        self.network.add_client(client_socket, greeter, decoder, frames=frames)
+
+    # a client another worker accepted for one of our rooms (handshake: the bytes it already read)
+    def adopt_client(self, client_socket, client_address, handshake):
+        decoder = FrameDecoder()
+        try:
+            frames = decoder.feed(handshake)
+        except ProtocolError:
+            client_socket.close()
+            return
+        self.accept_client(client_socket, client_address, decoder, frames)
+
+    # network thread: puts a client that sent its first frame into its room (or turns it away)
+    def admit(self, client_socket, client_address, kind, payload):
+        room_code, username, token = DEFAULT_ROOM, "", None
+        if kind == Kind.JOIN:
+            room_code, username = parse_join(payload)
+        elif kind == Kind.RESUME:
+            room_code, username, token = parse_resume(payload)
+
+        if not self.accepting_clients:
+            self.reject_client(client_socket, "server is shutting down")
+            return
+
+        # basic validation
+        if not username:
+            self.reject_client(client_socket, "ERROR: Username required")
+            return
+        # names end up in line based payloads (the scoreboard stream, the log), a newline in one
+        # would let a player write fake lines into everyone's board
+        if not (username.isprintable() and room_code.isprintable()):
+            self.reject_client(client_socket, "ERROR: Username and room code cant have control characters")
+            return
+
+        self.held.changed = changed = []
+        try:
+            with self.rooms_lock:
+                room = self.rooms.get(room_code)
+                if room is None and self.router is None:
+                    room = self.rooms[room_code] = GameRoom(self, room_code)
+                    self.log_message(f"room '{room_code}' created")
+                if room is not None:
+                    self.join_room(room, client_socket, client_address, username, token)
+        finally:
+            self.held.changed = None
+            for changed_room in dict.fromkeys(changed):
+                self.ui.room_changed(changed_room)
+        if room is not None:
+            return
+
+        # a room this worker doesnt have: who has it is the directory's call, a round trip that
+        # mustnt block the loop. the client isnt read until then, its first frame and everything
+        # read after it go along
+        frames, decoder = self.network.take_client(client_socket)
+        self.router.run(self.route_client, client_socket, client_address, room_code, [(kind, payload)] + frames, decoder)
+
+    # router thread: sends a client to the worker that has its room, or opens the room here and
+    # puts the client through the handshake again (its JOIN / RESUME is replayed first)
+    def route_client(self, client_socket, client_address, room_code, frames, decoder):
+        if not self.accepting_clients:
+            client_socket.close()
+            return
+        owner = self.router.owner(room_code)
+        if owner == self.router.worker:
+            with self.rooms_lock:
+                if room_code not in self.rooms:
+                    self.rooms[room_code] = GameRoom(self, room_code)
+                    self.log_message(f"room '{room_code}' created")
+            self.accept_client(client_socket, client_address, decoder, frames)
+            return
+
+        if self.router.forward(owner, client_socket, client_address, frames, bytes(decoder.buffer)):
+            self.log_message(f"{client_address[0]} handed over to worker {owner} (room '{room_code}')", DEBUG)
+        else:
+            self.metrics.rejects.inc()
+            try:
+                client_socket.send(encode_frame(Kind.ERROR, "ERROR: room not reachable, try again"))
+            except OSError:
+                pass
+        client_socket.close()  # the other worker has its own copy
+
+    # rooms_lock is held
+    def join_room(self, room, client_socket, client_address, username, token):
+        # back from a dropped connection: same player, same score, new socket
+        player_id = room.claim_session(username, token) if token else None
+        if player_id is not None:
+            self.network.set_handler(client_socket, room, room.stats)
+            room.log_message(f"{client_address[0]} resumed as '{username}'")
+            room.resume_player(client_socket, player_id)
+            return
+
+        # an unknown / expired token falls through to a normal JOIN
+
+        # game already running in that room / username already connected there
+        error = room.check_join(username)
+        if error:
+            room.log_message(f"'{username}' tried to join but wasnt accepted: {error}")
+            self.reject_client(client_socket, error)
+            return
+
+        # from here on its frames / disconnect go straight to its room
+        self.network.set_handler(client_socket, room, room.stats)
+
+        #after validating new client connections
+        room.log_message(f"New connection from {client_address[0]} as '{username}'")
+        room.add_player(client_socket, username)
+        self.metrics.joins.inc()
+
+    # tell a client why it cant join and close it once that is sent
+    def reject_client(self, client_socket, message):
+        self.metrics.rejects.inc()
+        try:
+            self.network.send(client_socket, encode_frame(Kind.ERROR, message))
+        except OSError:
+            pass
+        self.network.close_client(client_socket)
+
+#===================================================================================================================================
+# ROOMS: //////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    def all_rooms(self):
+        with self.rooms_lock:
+            return list(self.rooms.values())
+
+    def get_room(self, code):
+        with self.rooms_lock:
+            return self.rooms.get(code)
+
+    # rooms that have enough players and arent playing
+    def ready_rooms(self):
+        return [room for room in self.all_rooms() if len(room.players) >= self.min_players and not room.game_started]
+
+    # called by a room when players join or leave
+    def room_changed(self, room):
+        self.drop_room_if_empty(room)
+        self.tell_ui(room)
+
+    # called by a room when its game is over
+    def room_finished(self, room):
+        self.drop_room_if_empty(room)
+        self.tell_ui(room)
+
+    # the ui never hears from us while this thread holds rooms_lock (it may want the lock itself
+    # from another thread, the GUI's START GAME does): admit collects the rooms and tells it after
+    def tell_ui(self, room):
+        changed = getattr(self.held, "changed", None)
+        if changed is not None:
+            changed.append(room)
+        else:
+            self.ui.room_changed(room)
+
+    # empty rooms are thrown away so the dict doesnt grow forever, the code can be reused later
+    def drop_room_if_empty(self, room):
+        with self.rooms_lock:
+            if not room.players and not room.game_started and self.rooms.get(room.code) is room:
+                del self.rooms[room.code]
+                self.log_message(f"room '{room.code}' closed")
+                if self.router is not None:
+                    self.router.room_closed(room.code)  # the code can go to any worker now
+
+    # loads the questions and starts the game in a room on the shared pool.
+    # raises SetupError if something is wrong with the input
+    # time_limit: seconds per question, None = each round waits until everyone answered
+    def start_room(self, room_code, filename, n_questions, time_limit=None):
+        room = self.get_room(room_code or DEFAULT_ROOM)
+
+        if room is None:
+            raise SetupError("ERROR", f"NO ROOM CALLED '{room_code}'")
+        if room.game_started:
+            raise SetupError("ERROR", f"room '{room.code}' is already playing")
+        if len(room.players) < self.min_players:
+            raise SetupError("ERROR", f"room '{room.code}' needs at least {self.min_players} players")
+
+        if not filename:
+            raise SetupError("ERROR", "PLEASE ENTER FILE NAME")
+
+        # more validation of n_q
+        if n_questions <= 0:
+            raise SetupError("Input error", "Number of questions must be > 0")
+
+        # if the number is too big that it makes no sense
+        if n_questions > self.max_questions:
+            raise SetupError("Input error", "Number of question siis too big pls be reasonable -_-")
+
+        if time_limit is not None and time_limit <= 0:
+            raise SetupError("Input error", "Seconds per question must be > 0")
+
+        try:
+            room.load_questions(filename)
+        except FileNotFoundError:
+            raise SetupError("ERROR", "FILE NOT FOUND")
+        except PermissionError:
+            raise SetupError("File Error", f"No permission to read '{filename}'.")
+        except QuestionError as e:
+            raise SetupError("Question File Error", str(e))
+        except Exception as e:
+            raise SetupError("File Error", str(e))
+
+        room.log_message(f"number of questions in game: {n_questions}")
+        room.game_started = True  # ready_rooms / a second START GAME see it right away
+        self.game_pool.submit(room.start_game, n_questions, time_limit)
+        self.ui.room_changed(room)
+        return room
+
+#===================================================================================================================================
+# LOG: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # level: LogSink.DEBUG / INFO / WARNING / ERROR, room: the room's code if it is about one
+    def log_message(self, message, level=INFO, room=None):
+        if not self.log.enabled(level):
+            return
+        self.log.log(message, level, room)
+        self.ui.log_message(message)
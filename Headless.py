@@ -0,0 +1,195 @@
+import argparse
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from Engine import HANDSHAKE_TIMEOUT, LISTEN_BACKLOG, MAX_QUESTIONS, MIN_PLAYERS, QuizServer, ServerUI, SetupError
+from LogSink import BACKUPS, LEVELS, MAX_BYTES, WARNING, LogSink
+from Metrics import start_http, start_json_dump
+from Network import ACCEPT_BATCH, DEFAULT_HIGH_WATER, SLOW_POLICIES
+from ResultsStore import ResultsStore
+from Sharding import ShardRouter
+from Room import RESUME_GRACE
+
+# run the server without a window (containers, load tests):
+#   python -m Headless --port 5000 --questions questions.txt --count 5 --auto-start
+# never imports tkinter.
+
+
+# prints the log to stdout and (with auto_start) starts a room's game by itself
+# start_delay seconds after it has enough players, so more people can still get in
+class HeadlessUI(ServerUI):
+    # prefix: put in front of every line (workers of a Supervisor.py share one stdout)
+    def __init__(self, questions=None, n_questions=5, auto_start=False, start_delay=5.0, out=sys.stdout, time_limit=None, prefix=""):
+        self.server = None  # set by build_server
+        self.questions = questions
+        self.n_questions = n_questions
+        self.time_limit = time_limit
+        self.auto_start = auto_start
+        self.start_delay = start_delay
+        self.out = out
+        self.prefix = prefix
+
+        self.lock = threading.Lock()
+        self.countdowns = {}  # {room code: threading.Timer}
+
+    def log_message(self, message):
+        lines = message if isinstance(message, list) else [message]
+        stamp = time.strftime("%H:%M:%S")
+        with self.lock:
+            for line in lines:
+                self.out.write(f"{stamp} {self.prefix}{line}\n")
+            self.out.flush()
+
+    def room_changed(self, room):
+        if not self.auto_start or self.server is None:
+            return
+
+        with self.lock:
+            ready = len(room.players) >= self.server.min_players and not room.game_started
+            waiting = room.code in self.countdowns
+            if ready and not waiting:
+                timer = threading.Timer(self.start_delay, self.start_room, args=(room.code,))
+                timer.daemon = True
+                self.countdowns[room.code] = timer
+                timer.start()
+            elif not ready and waiting and not room.game_started:
+                # people left before the countdown ran out
+                self.countdowns.pop(room.code).cancel()
+
+        if ready and not waiting:
+            room.log_message(f"game starts in {self.start_delay:g}s")
+
+    def start_room(self, room_code):
+        with self.lock:
+            self.countdowns.pop(room_code, None)
+        try:
+            self.server.start_room(room_code, self.questions, self.n_questions, self.time_limit)
+        except SetupError as e:
+            self.server.log_message(f"[{room_code}] could not start game: {e}", WARNING, room_code)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m Headless", description="SUquid Quiz server without the GUI")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on (default 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=5000, help="port to listen on (default 5000, 0 = any free port)")
+    parser.add_argument("--questions", help="question file used when games are auto started")
+    parser.add_argument("--count", type=int, default=5, help="questions per game (default 5)")
+    parser.add_argument("--time-limit", type=float, help="seconds to answer each question (default: wait for everyone)")
+    parser.add_argument("--min-players", type=int, default=MIN_PLAYERS, help=f"players needed to start a room (default {MIN_PLAYERS})")
+    parser.add_argument("--max-questions", type=int, default=MAX_QUESTIONS, help=f"largest allowed --count (default {MAX_QUESTIONS})")
+    parser.add_argument("--auto-start", action="store_true", help="start a room's game once it has --min-players")
+    parser.add_argument("--start-delay", type=float, default=5.0, help="seconds to wait for more players before auto start (default 5)")
+    parser.add_argument("--high-water", type=int, default=DEFAULT_HIGH_WATER, help="bytes queued for one client before it counts as slow")
+    parser.add_argument("--slow-policy", choices=SLOW_POLICIES, default="coalesce", help="what to do with slow clients (default coalesce)")
+    parser.add_argument("--log-level", choices=LEVELS, default="info", help="debug also logs the scoreboard after every round (default info)")
+    parser.add_argument("--log-file", help="also write the log as json lines to this file (rotated)")
+    parser.add_argument("--log-max-bytes", type=int, default=MAX_BYTES, help=f"rotate the log file at this size (default {MAX_BYTES})")
+    parser.add_argument("--log-backups", type=int, default=BACKUPS, help=f"rotated log files to keep (default {BACKUPS})")
+    parser.add_argument("--trace-dir", help="write a Chrome trace / Perfetto json of every game to this folder")
+    parser.add_argument("--profile", action="store_true", help="cProfile every game thread, dumped in --trace-dir (or the current folder)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-json", help="write a json metrics snapshot to this file every --metrics-interval seconds")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="seconds between json snapshots (default 10)")
+    parser.add_argument("--resume-grace", type=float, default=RESUME_GRACE,
+                        help=f"seconds a player who drops mid game can reconnect and keep their score (default {RESUME_GRACE}, 0 = off)")
+    parser.add_argument("--results-db", help="save every game's answers and scores to this SQLite file (leaderboards: python -m ResultsStore)")
+    parser.add_argument("--backlog", type=int, default=LISTEN_BACKLOG, help=f"connections the kernel queues before we accept them (default {LISTEN_BACKLOG})")
+    parser.add_argument("--accept-batch", type=int, default=ACCEPT_BATCH, help=f"connections accepted per network loop wakeup (default {ACCEPT_BATCH})")
+    parser.add_argument("--handshake-timeout", type=float, default=HANDSHAKE_TIMEOUT,
+                        help=f"seconds a new connection gets to send its JOIN (default {HANDSHAKE_TIMEOUT:g})")
+    parser.add_argument("--reuse-port", action="store_true", help="listen with SO_REUSEPORT so other servers can share the port")
+    # set by Supervisor.py for its workers
+    parser.add_argument("--listen-fd", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--shard-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    return parser
+
+
+def build_server(args, out=sys.stdout):
+    prefix = f"[w{args.worker}] " if args.worker is not None else ""
+    ui = HeadlessUI(args.questions, args.count, args.auto_start, args.start_delay, out, args.time_limit, prefix)
+    server = QuizServer(ui=ui, min_players=args.min_players, max_questions=args.max_questions,
+                        high_water=args.high_water, slow_policy=args.slow_policy,
+                        trace_dir=args.trace_dir, profile=args.profile,
+                        log=LogSink(LEVELS[args.log_level], path=args.log_file,
+                                    max_bytes=args.log_max_bytes, backups=args.log_backups),
+                        results=ResultsStore(args.results_db) if args.results_db else None,
+                        resume_grace=args.resume_grace, backlog=args.backlog,
+                        handshake_timeout=args.handshake_timeout, accept_batch=args.accept_batch)
+    ui.server = server
+    if args.shard_dir is not None:
+        server.router = ShardRouter(args.shard_dir, args.worker)
+    return server
+
+
+def close_server(server):
+    if server.router is not None:
+        server.router.close()
+    server.log.close()
+    if server.results is not None:
+        server.results.close()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.auto_start and not args.questions:
+        parser.error("--auto-start needs --questions")
+
+    try:
+        server = build_server(args)
+    except OSError as e:
+        print(f"Could not open log file: {e}", file=sys.stderr)
+        return 1
+    except sqlite3.Error as e:
+        print(f"Could not open results database: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        listen_socket = socket.socket(fileno=args.listen_fd) if args.listen_fd is not None else None
+        server.start(args.port, args.host, args.reuse_port, listen_socket)
+        if server.router is not None:
+            server.router.start(server)
+    except OSError as e:
+        print(f"Could not start server: {e}", file=sys.stderr)
+        server.stop()
+        close_server(server)
+        return 1
+
+    server.log_message(f"======== SERVER LISTENING ON {args.host}:{server.port()} =========")
+
+    metrics_http, metrics_dump = None, None
+    try:
+        if args.metrics_port is not None:
+            metrics_http = start_http(server.metrics, args.metrics_port)
+            server.log_message(f"metrics on http://127.0.0.1:{metrics_http.server_port}/metrics")
+        if args.metrics_json:
+            metrics_dump = start_json_dump(server.metrics, args.metrics_json, args.metrics_interval)
+    except OSError as e:
+        server.log_message(f"could not start metrics: {e}")
+
+    # docker / systemd stop with SIGTERM: shut down the same way as ctrl+c so the log gets flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stopped.set())
+
+    try:
+        # everything happens on the network / game threads, just wait for ctrl+c
+        while not server.stopped.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop("Server disconnected")
+        if metrics_http is not None:
+            metrics_http.shutdown()
+        if metrics_dump is not None:
+            metrics_dump.set()
+        close_server(server)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+
+from BoardStream import DELTA, GAP, BoardModel
+from Protocol import HEADER_SIZE, FrameDecoder, Kind, ProtocolError, encode_frame, join_payload
+from QuestionBank import load_bank
+
+# load generator: plays full games against the server with asyncio bots, all on localhost.
+#   python -m LoadTest --bots 1000 --rooms 10 --count 5
+# starts a QuizServer in this process (so it can also report the server's send syscalls / bytes)
+# and starts each room's game once all its bots are in. to test a server running elsewhere use
+#   python -m Headless --port 5000 --questions questions.txt --auto-start --start-delay 10
+#   python -m LoadTest --port 5000 --bots 1000 --rooms 10
+# exits with 1 if a bot failed or didnt see its game to the end, --json writes the numbers for CI.
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.txt")
+
+
+# think time specs: "fixed:0.2", "uniform:0.1:1.5", "exp:0.5" (mean), "normal:0.5:0.1" (mean, stddev)
+def think_sampler(spec, rng):
+    name, _, params = spec.partition(":")
+    try:
+        args = [float(p) for p in params.split(":")] if params else []
+    except ValueError:
+        raise ValueError(f"bad think time '{spec}'")
+
+    if name == "fixed" and len(args) == 1:
+        return lambda: args[0]
+    if name == "uniform" and len(args) == 2:
+        return lambda: rng.uniform(args[0], args[1])
+    if name == "exp" and len(args) == 1:
+        return lambda: rng.expovariate(1 / args[0]) if args[0] > 0 else 0.0
+    if name == "normal" and len(args) == 2:
+        return lambda: max(0.0, rng.gauss(args[0], args[1]))
+    raise ValueError(f"bad think time '{spec}'")
+
+
+# nearest rank percentile, values must be sorted
+def percentile(values, p):
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+# {question text: correct letter} so bots can answer right on purpose
+def answer_key(filename):
+    if not filename:
+        return {}
+    bank = load_bank(filename)
+    return {q["question"]: q["correct_option"] for q in (bank[i] for i in range(len(bank)))}
+
+
+#===================================================================================================================================
+# BOT: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+class Bot:
+    def __init__(self, name, room, key, accuracy, think, rng):
+        self.name = name
+        self.room = room
+        self.key = key
+        self.accuracy = accuracy
+        self.think = think
+        self.rng = rng
+
+        self.joined = asyncio.Event()
+        self.joined_at = None
+        self.error = None
+        self.finished = False  # saw the RESULTS frame
+
+        self.rounds = 0
+        self.round_latency = []       # QUESTION received -> board delta received
+        self.round_bytes = []         # bytes received from a QUESTION up to its board delta (both included)
+        self.feedback_latency = []    # ANSWER sent -> FEEDBACK received
+        self.board = BoardModel()     # kept like a real client does, RESYNC when a delta is missing
+        self.resyncs = 0
+
+        self.question_at = None
+        self.answered_at = None
+        self.bytes_this_round = 0
+        self.answer_task = None
+        self.connect_slots = None
+
+    # a connect slot is held until the server welcomed us (or turned us away), so
+    # --connect-concurrency limits whole handshakes in flight, not just TCP connects
+    async def run(self, host, port, connect_slots):
+        self.connect_slots = connect_slots
+        await connect_slots.acquire()
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(encode_frame(Kind.JOIN, join_payload(self.name, self.room)))
+        except OSError as e:
+            self.error = f"connect: {e}"
+            self.joined.set()
+            connect_slots.release()
+            return
+
+        decoder = FrameDecoder()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                for kind, payload in decoder.feed(data):
+                    self.handle(kind, payload, writer)
+        except (OSError, ProtocolError) as e:
+            self.error = f"connection: {e}"
+        finally:
+            if self.answer_task is not None:
+                self.answer_task.cancel()
+            writer.close()
+            if not self.joined.is_set():
+                self.joined.set()  # rejected / dropped before the welcome
+                connect_slots.release()
+
+    def handle(self, kind, payload, writer):
+        now = time.perf_counter()
+        if kind == Kind.QUESTION:
+            self.bytes_this_round = 0  # the welcome, lobby chatter, results dont count towards a round
+        self.bytes_this_round += HEADER_SIZE + len(payload.encode("utf-8"))
+        if kind == Kind.ERROR:
+            self.error = f"rejected: {payload}"
+        elif kind == Kind.INFO and payload.startswith("Welcome"):
+            self.joined_at = now
+            self.joined.set()
+            self.connect_slots.release()
+        elif kind == Kind.QUESTION:
+            self.question_at = now
+            self.answered_at = None
+            lines = payload.split("\n")
+            question = lines[3] if len(lines) > 3 else ""
+            if self.answer_task is not None:
+                self.answer_task.cancel()  # still thinking about the last one: that round is over
+            self.answer_task = asyncio.ensure_future(self.answer(question, writer))
+        elif kind == Kind.FEEDBACK:
+            if self.answered_at is not None:
+                self.feedback_latency.append(now - self.answered_at)
+                self.answered_at = None
+        elif kind == Kind.BOARD:
+            try:
+                if self.board.apply(payload) == GAP:
+                    self.resyncs += 1
+                    writer.write(encode_frame(Kind.RESYNC, ""))
+            except ValueError:
+                self.error = f"bad board: {payload[:40]!r}"
+            # a round ends with a delta, a snapshot (resync) can come any time
+            if self.question_at is not None and payload.startswith(DELTA):
+                self.round_latency.append(now - self.question_at)
+                self.round_bytes.append(self.bytes_this_round)
+                self.question_at = None
+                self.rounds += 1
+        elif kind == Kind.RESULTS:
+            self.finished = True
+
+    async def answer(self, question, writer):
+        await asyncio.sleep(self.think())
+        correct = self.key.get(question)
+        if correct and self.rng.random() < self.accuracy:
+            letter = correct
+        else:
+            letter = self.rng.choice([c for c in "ABC" if c != correct])
+        writer.write(encode_frame(Kind.ANSWER, letter))
+        self.answered_at = time.perf_counter()
+
+
+#===================================================================================================================================
+# IN PROCESS SERVER: //////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+def start_local_server(args):
+    from Engine import QuizServer, ServerUI
+
+    class QuietUI(ServerUI):
+        def __init__(self, out):
+            self.out = out
+
+        def log_message(self, message):
+            if self.out is not None:
+                for line in message if isinstance(message, list) else [message]:
+                    self.out.write(line + "\n")
+
+    out = open(args.server_log, "w", encoding="utf-8") if args.server_log else None
+    server = QuizServer(ui=QuietUI(out), min_players=1, max_questions=max(args.count, 1))
+    server.start(0, "127.0.0.1")
+    return server, out
+
+
+def raise_fd_limit(needed):
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+
+
+#===================================================================================================================================
+# RUN & REPORT: ///////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+async def run_load(args, host, port, server=None):
+    rng = random.Random(args.seed)
+    think = think_sampler(args.think, rng)
+    key = answer_key(args.questions)
+    room_codes = [f"load{r}" for r in range(args.rooms)]
+
+    bots = [Bot(f"bot{i}", room_codes[i % args.rooms], key, args.accuracy, think, rng) for i in range(args.bots)]
+    connect_slots = asyncio.Semaphore(args.connect_concurrency)
+
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(bot.run(host, port, connect_slots)) for bot in bots]
+    await asyncio.gather(*(bot.joined.wait() for bot in bots))
+    all_joined = time.perf_counter()
+
+    rooms = []
+    if server is not None:
+        loop = asyncio.get_running_loop()
+        for code in room_codes:
+            room = server.get_room(code)
+            if room is None:
+                continue
+            rooms.append(room)
+            await loop.run_in_executor(None, server.start_room, code, args.questions, args.count, args.time_limit)
+
+    await asyncio.wait_for(asyncio.gather(*tasks), args.timeout)
+    finished = time.perf_counter()
+    return report(args, bots, rooms, started, all_joined, finished)
+
+
+def latency_summary(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": ms(percentile(values, 50)),
+        "p90_ms": ms(percentile(values, 90)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1] if values else None),
+    }
+
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def report(args, bots, rooms, started, all_joined, finished):
+    joined = [b for b in bots if b.joined_at is not None]
+    rounds = sum(b.rounds for b in bots)
+    round_stats = [r for room in rooms for r in room.round_stats]
+
+    result = {
+        "bots": len(bots),
+        "rooms": args.rooms,
+        "questions": args.count,
+        "joined": len(joined),
+        "finished": sum(1 for b in bots if b.finished),
+        "errors": sorted({b.error for b in bots if b.error}),
+        "connect_seconds": round(all_joined - started, 3),
+        "connections_per_second": round(len(joined) / max(all_joined - started, 1e-9), 1),
+        "total_seconds": round(finished - started, 3),
+        "round_latency": latency_summary([x for b in bots for x in b.round_latency]),
+        "answer_to_feedback": latency_summary([x for b in bots for x in b.feedback_latency]),
+        "client_bytes_per_player_round": round(sum(x for b in bots for x in b.round_bytes) / rounds, 1) if rounds else None,
+        "board_resyncs": sum(b.resyncs for b in bots),
+    }
+    if round_stats:
+        # every room's rounds, server side (Room.round_stats)
+        result["server_send_calls_per_round"] = round(sum(r[0] for r in round_stats) / len(round_stats), 1)
+        result["server_bytes_per_round"] = round(sum(r[1] for r in round_stats) / len(round_stats), 1)
+        result["server_players_per_round"] = round(sum(r[2] for r in round_stats) / len(round_stats), 1)
+    return result
+
+
+def print_report(result, out=sys.stdout):
+    w = out.write
+    w(f"bots: {result['bots']} in {result['rooms']} rooms, {result['questions']} questions\n")
+    w(f"joined: {result['joined']}  finished: {result['finished']}\n")
+    for error in result["errors"][:10]:
+        w(f"  error: {error}\n")
+    w(f"connect: {result['connect_seconds']}s ({result['connections_per_second']}/s)\n")
+    for name, title in (("round_latency", "round (question -> board delta)"), ("answer_to_feedback", "answer -> feedback")):
+        s = result[name]
+        w(f"{title}: n={s['count']} p50={s['p50_ms']}ms p90={s['p90_ms']}ms p99={s['p99_ms']}ms max={s['max_ms']}ms\n")
+    w(f"client bytes per player per round (question -> board delta): {result['client_bytes_per_player_round']}, board resyncs: {result['board_resyncs']}\n")
+    if "server_send_calls_per_round" in result:
+        w(f"server per round: {result['server_send_calls_per_round']} send syscalls, "
+          f"{result['server_bytes_per_round']} bytes for {result['server_players_per_round']} players\n")
+    w(f"total: {result['total_seconds']}s\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m LoadTest", description="asyncio bot players for the SUquid Quiz server")
+    parser.add_argument("--host", default="127.0.0.1", help="server address (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="server port; if not given a server is started in this process")
+    parser.add_argument("--bots", type=int, default=100, help="number of bot players (default 100)")
+    parser.add_argument("--rooms", type=int, default=1, help="rooms the bots are spread over (default 1)")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="question file (server bank + answer key)")
+    parser.add_argument("--count", type=int, default=5, help="questions per game (default 5)")
+    parser.add_argument("--time-limit", type=float, help="seconds per question (in process server only)")
+    parser.add_argument("--think", default="uniform:0.05:0.5", help="think time: fixed:S, uniform:A:B, exp:MEAN, normal:MEAN:SD")
+    parser.add_argument("--accuracy", type=float, default=0.7, help="chance a bot answers right (default 0.7)")
+    parser.add_argument("--connect-concurrency", type=int, default=100, help="joins in flight at once (default 100)")
+    parser.add_argument("--timeout", type=float, default=600, help="give up after this many seconds (default 600)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for repeatable runs")
+    parser.add_argument("--server-log", help="write the in process server's log here")
+    parser.add_argument("--json", help="also write the report as json to this file")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.bots < 1 or args.rooms < 1 or args.rooms > args.bots:
+        parser.error("need --bots >= --rooms >= 1")
+    try:
+        think_sampler(args.think, random.Random())
+    except ValueError as e:
+        parser.error(str(e))
+
+    raise_fd_limit(2 * args.bots + 64)  # a bot + its server side socket each
+
+    server, log_file = None, None
+    host, port = args.host, args.port
+    if port is None:
+        server, log_file = start_local_server(args)
+        host, port = "127.0.0.1", server.port()
+
+    try:
+        result = asyncio.run(run_load(args, host, port, server))
+    except asyncio.TimeoutError:
+        print(f"load test did not finish in {args.timeout:g}s", file=sys.stderr)
+        return 1
+    finally:
+        if server is not None:
+            server.stop()
+        if log_file is not None:
+            log_file.close()
+
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+    return 0 if result["finished"] == result["bots"] and not result["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
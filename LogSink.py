@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# where the server's log goes: every line becomes a record {seq, ts, level, room, msg}.
+#  - a ring buffer of the last ring_size records, the live views read it (GUI polls since(seq))
+#  - optionally a JSON lines file, written in batches by a background thread every
+#    flush_interval seconds and rotated at max_bytes (file, file.1 .. file.<backups>)
+# records below the sink's level are thrown away before anything is formatted or stored,
+# so DEBUG lines (scoreboard dumps after every round..) cost nothing in production.
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {v: k for k, v in LEVELS.items()}
+
+RING_SIZE = 5000
+MAX_BYTES = 10 * 1024 * 1024
+BACKUPS = 5
+
+
+class LogSink:
+    def __init__(self, level=INFO, ring_size=RING_SIZE, path=None, max_bytes=MAX_BYTES, backups=BACKUPS, flush_interval=0.5):
+        self.level = level
+        self.ring = deque(maxlen=ring_size)
+        self.seq = 0
+        self.lock = threading.Lock()
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.batch = []  # records waiting for the writer thread
+        self.file = None
+        self.file_lock = threading.Lock()  # one flush / rotate at a time (the writer thread and Engine.stop both flush)
+        self.stopped = threading.Event()
+        self.writer = None
+        if path:
+            self.file = open(path, "a", encoding="utf-8")
+            self.writer = threading.Thread(target=self.write_loop, name="log writer", daemon=True)
+            self.writer.start()
+
+    def enabled(self, level):
+        return level >= self.level
+
+    # message: a line or a list of lines, each one becomes its own record
+    def log(self, message, level=INFO, room=None):
+        if level < self.level:
+            return
+        lines = message if isinstance(message, list) else [message]
+        now = time.time()
+        with self.lock:
+            for line in lines:
+                self.seq += 1
+                record = {"seq": self.seq, "ts": now, "level": LEVEL_NAMES.get(level, level), "room": room, "msg": str(line)}
+                self.ring.append(record)
+                if self.file is not None:
+                    self.batch.append(record)
+
+    # records newer than seq that are still in the ring, oldest first
+    def since(self, seq):
+        with self.lock:
+            if not self.ring or self.ring[-1]["seq"] <= seq:
+                return []
+            newer = []
+            for record in reversed(self.ring):
+                if record["seq"] <= seq:
+                    break
+                newer.append(record)
+        newer.reverse()
+        return newer
+
+#===================================================================================================================================
+# FILE: ///////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    def write_loop(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    # writes everything waiting in one go (the writer thread calls this, close() too)
+    def flush(self):
+        with self.file_lock:
+            with self.lock:
+                batch, self.batch = self.batch, []
+            if not batch or self.file is None:
+                return
+            data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+            try:
+                if self.max_bytes and not self.file.closed and self.file.tell() + len(data) > self.max_bytes and self.file.tell() > 0:
+                    try:
+                        self.rotate()
+                    except OSError:
+                        pass  # the lines still go to the file, the next flush tries rotating again
+                if self.file.closed:
+                    self.file = open(self.path, "a", encoding="utf-8")  # a rotation couldnt reopen it
+                self.file.write(data)
+                self.file.flush()
+            except OSError:
+                pass  # a full disk must not take the game down
+
+    # file -> file.1 -> file.2 .. the oldest one is deleted. call with file_lock held
+    def rotate(self):
+        self.file.close()
+        try:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            if self.backups > 0:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+        finally:
+            # even if a rename failed, then the same file just keeps growing
+            self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.stopped.set()
+        self.writer.join()
+        self.writer = None
+        with self.file_lock:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# counters, gauges and histograms for the server, cheap enough to leave on:
+# an update is a lock + an add (histograms: + a bisect over ~15 bucket bounds), and anything
+# that can be read off the server's own state (players, queued bytes..) is a gauge with a
+# function that only runs when someone scrapes.
+#
+# two ways to read them:
+#   start_http(metrics, port)            - GET /metrics (Prometheus text format) and /metrics.json
+#   start_json_dump(metrics, path, secs) - rewrites a json file every few seconds
+
+# seconds, from "nothing happened" to "a round that took way too long"
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Counter:
+    kind = "counter"
+
+    # label: name of the one label this counter is split by (e.g. "reason"), None for a plain counter
+    # fn: read the value from somewhere else instead of counting here
+    def __init__(self, name, help, label=None, fn=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.fn = fn
+        self.lock = threading.Lock()
+        self.values = {}  # {label value (None if no label): count}
+
+    def inc(self, amount=1, label_value=None):
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def samples(self):
+        if self.fn is not None:
+            return [(None, self.fn())]
+        with self.lock:
+            return list(self.values.items()) or [(None, 0)]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, label_value=None):
+        with self.lock:
+            self.values[label_value] = value
+
+    def dec(self, amount=1, label_value=None):
+        self.inc(-amount, label_value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    # label: like Counter's, one histogram per label value (None for a plain histogram)
+    def __init__(self, name, help, buckets=TIME_BUCKETS, label=None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label = label
+        self.lock = threading.Lock()
+        self.series = {}  # {label value: [counts per bucket (last one is +Inf), sum, count]}
+        if label is None:
+            self.series[None] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+    def observe(self, value, label_value=None):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    # stop exporting one label value (a player who left)
+    def remove(self, label_value):
+        with self.lock:
+            self.series.pop(label_value, None)
+
+    # [(upper bound, cumulative count)], sum, count
+    def snapshot(self, label_value=None):
+        with self.lock:
+            counts, total, n = self.series.get(label_value) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts = list(counts)
+        cumulative = []
+        running = 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            running += c
+            cumulative.append((bound, running))
+        return cumulative, total, n
+
+    def label_values(self):
+        with self.lock:
+            return list(self.series)
+
+
+def escape(label_value):
+    return str(label_value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def histogram_json(histogram, label_value=None):
+    cumulative, total, n = histogram.snapshot(label_value)
+    return {"count": n, "sum": total, "buckets": {("+Inf" if b == float("inf") else f"{b:g}"): c for b, c in cumulative}}
+
+
+#===================================================================================================================================
+# REGISTRY: ///////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, label=None, fn=None):
+        return self.add(Counter(name, help, label, fn))
+
+    def gauge(self, name, help, label=None, fn=None):
+        return self.add(Gauge(name, help, label, fn))
+
+    def histogram(self, name, help, buckets=TIME_BUCKETS, label=None):
+        return self.add(Histogram(name, help, buckets, label))
+
+    # Prometheus text exposition format
+    def render(self):
+        lines = []
+        for m in self.metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            if isinstance(m, Histogram):
+                for label_value in m.label_values():
+                    cumulative, total, n = m.snapshot(label_value)
+                    label = "" if label_value is None else f'{m.label}="{escape(label_value)}",'
+                    for bound, c in cumulative:
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f'{m.name}_bucket{{{label}le="{le}"}} {c}')
+                    label = f"{{{label[:-1]}}}" if label else ""
+                    lines.append(f"{m.name}_sum{label} {total:g}")
+                    lines.append(f"{m.name}_count{label} {n}")
+                continue
+            for label_value, value in m.samples():
+                if m.label is None or label_value is None:
+                    lines.append(f"{m.name} {value:g}")
+                else:
+                    lines.append(f'{m.name}{{{m.label}="{escape(label_value)}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        result = {"time": time.time()}
+        for m in self.metrics:
+            if isinstance(m, Histogram):
+                result[m.name] = {str(v): histogram_json(m, v) for v in m.label_values()} if m.label else histogram_json(m)
+            elif m.label is None:
+                result[m.name] = m.samples()[0][1]
+            else:
+                result[m.name] = {str(k): v for k, v in m.samples() if k is not None}
+        return result
+
+
+# everything the server measures, one instance per QuizServer (Engine.py)
+class ServerMetrics(Registry):
+    def __init__(self):
+        super().__init__()
+        # filled in by the engine, read when scraped
+        self.players = self.gauge("quiz_players", "players connected to a room")
+        self.rooms = self.gauge("quiz_rooms", "open rooms")
+        self.games_running = self.gauge("quiz_games_running", "rooms playing a game")
+        self.queued_bytes = self.gauge("quiz_outbound_queued_bytes", "bytes waiting in client send queues")
+        self.pending_ops = self.gauge("quiz_network_pending_ops", "ops waiting for the network loop")
+
+        self.bytes_sent = self.counter("quiz_bytes_sent_total", "bytes written to client sockets")
+        self.send_calls = self.counter("quiz_send_syscalls_total", "send/sendmsg calls")
+        self.bytes_received = self.counter("quiz_bytes_received_total", "bytes read from client sockets")
+        self.frames_received = self.counter("quiz_frames_received_total", "frames decoded from clients")
+
+        self.accepts = self.counter("quiz_accepted_connections_total", "tcp connections accepted")
+        self.handshake_timeouts = self.counter("quiz_handshake_timeouts_total", "connections closed for not sending JOIN / RESUME in time")
+        self.joins = self.counter("quiz_joins_total", "players accepted into a room")
+        self.rejects = self.counter("quiz_rejected_joins_total", "connections turned away at the handshake")
+        self.disconnects = self.counter("quiz_disconnects_total", "players removed from a room", label="reason")
+        self.slow_evictions = self.counter("quiz_slow_client_evictions_total", "clients kicked for being too slow")
+        self.dropped_frames = self.counter("quiz_dropped_frames_total", "frames thrown away by the drop policy")
+        self.coalesced_frames = self.counter("quiz_coalesced_frames_total", "unsent scoreboards replaced by newer ones")
+
+        self.games = self.counter("quiz_games_total", "games started")
+        self.rounds = self.counter("quiz_rounds_total", "rounds played")
+        self.answers = self.counter("quiz_answers_total", "answers recorded")
+
+        self.answer_wait = self.histogram("quiz_answer_collection_seconds", "question sent -> round closed")
+        # answers are stamped when the network loop reads them (Network.py), so the time a player
+        # took and the time the answer then sat in the server are told apart
+        self.answer_latency = self.histogram("quiz_answer_latency_seconds", "question sent -> answer read off the socket",
+                                             label="player")
+        self.answer_queue = self.histogram("quiz_answer_queue_seconds", "answer read off the socket -> recorded by its room")
+        self.grading = self.histogram("quiz_grading_seconds", "grade_round + rendering the scoreboard")
+        self.fanout = self.histogram("quiz_broadcast_seconds", "time to queue one broadcast for every player")
+
+
+#===================================================================================================================================
+# EXPORTING: //////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+# serves GET /metrics and /metrics.json on a daemon thread, returns the server (call shutdown() to stop)
+def start_http(metrics, port, host="127.0.0.1"):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, ctype = metrics.render().encode("utf-8"), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, ctype = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would flood the server log
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# rewrites path with a json snapshot every interval seconds until the returned event is set
+def start_json_dump(metrics, path, interval=10.0):
+    stop = threading.Event()
+
+    def write():
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as file:
+                json.dump(metrics.snapshot(), file)
+            os.replace(tmp, path)  # readers never see half a file
+        except OSError:
+            pass
+
+    def dump():
+        write()
+        while not stop.wait(interval):
+            write()
+        write()  # last numbers when the server stops
+
+    threading.Thread(target=dump, daemon=True).start()
+    return stop
@@ -0,0 +1,525 @@
+import heapq
+import selectors
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from itertools import count, islice
+
+from Metrics import ServerMetrics
+from Protocol import FrameDecoder, Kind, ProtocolError
+
+HAS_SENDMSG = hasattr(socket.socket, "sendmsg")  # not on windows
+MAX_IOV = 64  # max buffers handed to one sendmsg call
+
+DEFAULT_HIGH_WATER = 256 * 1024  # bytes queued for one client before we call it slow
+SLOW_POLICIES = ("drop", "disconnect", "coalesce")
+LINGER_SECONDS = 5.0  # how long a closed client gets to receive what is still queued for it
+ACCEPT_BATCH = 64     # connections accepted per wakeup of a listening socket, so a join burst doesnt starve the players
+
+
+class SlowClientError(ConnectionError):
+    pass
+
+
+# counts what actually hits the kernel so we can see what a round costs
+class IOStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.send_calls = 0   # send/sendmsg syscalls
+        self.bytes_sent = 0
+
+    def add(self, calls, nbytes):
+        with self.lock:
+            self.send_calls += calls
+            self.bytes_sent += nbytes
+
+    # returns (send_calls, bytes_sent) since the last call and starts counting from 0 again
+    def take(self):
+        with self.lock:
+            result = (self.send_calls, self.bytes_sent)
+            self.send_calls = 0
+            self.bytes_sent = 0
+        return result
+
+
+# returned by call_later / call_at. cancelling just marks it, the heap entry is skipped when it comes up
+class Timer:
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+# a listening socket the loop accepts on
+class Listener:
+    __slots__ = ("sock", "on_accept", "batch")
+
+    def __init__(self, sock, on_accept, batch):
+        self.sock = sock
+        self.on_accept = on_accept  # on_accept(client_socket, address) on the loop thread
+        self.batch = batch
+
+
+# everything the loop keeps per client socket
+class Connection:
+    __slots__ = ("sock", "decoder", "handler", "stats", "lock", "out", "out_bytes", "partial", "closing", "close_timer", "dropped",
+                 "unhandled")
+
+    def __init__(self, sock, decoder, handler, stats):
+        self.sock = sock
+        self.decoder = decoder
+        self.handler = handler        # gets this client's frames / disconnect (its room)
+        self.stats = stats            # extra IOStats to count this client's writes in (its room's), or None
+        self.lock = threading.Lock()  # guards out / out_bytes / partial (game thread queues, loop drains)
+        self.out = deque()            # memoryviews of frames not written yet
+        self.out_bytes = 0
+        self.partial = False          # True when out[0] is a frame that is half written
+        self.closing = False
+        self.close_timer = None       # gives up flushing and closes after LINGER_SECONDS
+        self.dropped = 0              # frames thrown away by the "drop" policy
+        self.unhandled = None         # while dispatching: iterator over the frames of this read not handled yet
+
+
+# one thread, one selector, every client socket registered in it.
+# instead of a thread per player sleeping on recv(timeout=1) we block in select() until
+# some socket actually has data, so thousands of idle connections cost nothing.
+#
+# nothing is queued for anybody to poll: every decoded frame goes straight to the connection's
+# handler on this thread, handler.handle_frame(sock, kind, payload, arrived), and a closed / broken
+# socket to handler.handle_disconnect(sock). handlers must be quick and must not block.
+# arrived is time.perf_counter() taken right after the recv() that read the frame: the frames
+# of one read share it, two players never do (so who was first never depends on which fd the
+# selector happened to list first).
+#
+# it can also accept: listen() registers the server socket, and every time it is readable up to
+# ACCEPT_BATCH connections are accepted and given to on_accept, which usually add_client()s them
+# with a handler that waits for the first frame (the handshake is just another state of a
+# connection, nobody blocks on a recv).
+#
+# the loop is also the timer service (round deadlines, countdowns, closing slow sockets):
+# call_later / call_at push onto one heap and select() sleeps exactly until the earliest one,
+# so thousands of rooms with running clocks still cost one sleeping thread. callbacks run on
+# the loop thread, so the same rules as handlers apply.
+#
+# writes never block the caller: frames go into the connection's out queue, we try to write
+# them right away, and whatever the kernel doesnt take is drained by the loop when the socket
+# becomes writable. a client whose queue passes high_water is handled by slow_policy:
+#   "drop"       - throw away the new frames
+#   "disconnect" - kick the client (send raises SlowClientError)
+#   "coalesce"   - replace queued, unsent scoreboards with the newest one; if that isnt enough, kick
+class NetworkCore:
+    def __init__(self, high_water=DEFAULT_HIGH_WATER, slow_policy="coalesce", metrics=None):
+        if slow_policy not in SLOW_POLICIES:
+            raise ValueError(f"slow_policy must be one of {SLOW_POLICIES}")
+
+        self.high_water = high_water
+        self.slow_policy = slow_policy
+        self.selector = selectors.DefaultSelector()
+        self.thread = None
+        self.running = False
+        self.stats = IOStats()  # everything written, never reset
+
+        self.connections = {}  # {client_socket: Connection}
+
+        self.metrics = metrics or ServerMetrics()
+        self.metrics.bytes_sent.fn = lambda: self.stats.bytes_sent
+        self.metrics.send_calls.fn = lambda: self.stats.send_calls
+        self.metrics.queued_bytes.fn = lambda: sum(c.out_bytes for c in list(self.connections.values()))
+        self.metrics.pending_ops.fn = lambda: len(self.pending)
+
+        self.timers = []       # heap of (when, seq, Timer), seq keeps equal deadlines in order
+        self.timer_seq = count()
+        self.timers_lock = threading.Lock()
+
+        # other threads cant touch the selector safely, so they queue ops here
+        # and poke the loop through a socketpair so select() wakes up right away
+        self.pending = deque()
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+
+#===================================================================================================================================
+# STARTING & STOPPING THE LOOP: ////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.wake()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        self.thread = None
+
+    # wake the loop from another thread
+    def wake(self):
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # already a wakeup byte waiting, thats enough
+
+    def queue_op(self, op, conn):
+        self.pending.append((op, conn))
+        if threading.current_thread() is not self.thread:
+            self.wake()  # the loop itself gets to pending before it sleeps again
+
+#===================================================================================================================================
+# TIMERS (thread safe): ////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # run callback(*args) on the loop thread after delay seconds
+    def call_later(self, delay, callback, *args):
+        return self.call_at(time.monotonic() + delay, callback, *args)
+
+    # same with an absolute time.monotonic() deadline
+    def call_at(self, when, callback, *args):
+        timer = Timer(when, callback, args)
+        with self.timers_lock:
+            heapq.heappush(self.timers, (when, next(self.timer_seq), timer))
+            earliest = self.timers[0][2] is timer
+        # the loop may be sleeping until a later deadline, make it recompute
+        if earliest and threading.current_thread() is not self.thread:
+            self.wake()
+        return timer
+
+    # runs every timer that is due, returns seconds until the next one (None if there is none)
+    def run_timers(self):
+        now = time.monotonic()
+        due = []
+        with self.timers_lock:
+            while self.timers and self.timers[0][0] <= now:
+                due.append(heapq.heappop(self.timers)[2])
+
+        for timer in due:
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                traceback.print_exc()
+
+        with self.timers_lock:
+            # drop cancelled timers sitting at the top so they dont cause useless wakeups
+            while self.timers and self.timers[0][2].cancelled:
+                heapq.heappop(self.timers)
+            if not self.timers:
+                return None
+            return max(0.0, self.timers[0][0] - time.monotonic())
+
+#===================================================================================================================================
+# ADDING & REMOVING CLIENTS (thread safe): /////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # accept clients on a listening socket (on_accept(client_socket, address) runs on the loop thread)
+    def listen(self, server_socket, on_accept, batch=ACCEPT_BATCH):
+        server_socket.setblocking(False)
+        self.queue_op("listen", Listener(server_socket, on_accept, batch))
+
+    # handler: who gets this client's frames and disconnect (its room)
+    # decoder: one that already has bytes of this client (from another process), frames: frames
+    # already read from it, the handler gets them first once the loop has registered the socket
+    # stats: an extra IOStats to count this client's writes in (its room's)
+    def add_client(self, client_socket, handler, decoder=None, stats=None, frames=()):
+        client_socket.setblocking(False)
+        conn = Connection(client_socket, decoder or FrameDecoder(), handler, stats)
+        self.connections[client_socket] = conn  # visible to send() right away, the loop registers it later
+        self.queue_op("add", (conn, frames) if frames else conn)
+
+    # the client's frames / disconnect go to someone else from now on (handshake -> room)
+    def set_handler(self, client_socket, handler, stats=None):
+        conn = self.connections.get(client_socket)
+        if conn is None:
+            raise ConnectionError("client is not connected")
+        conn.handler = handler
+        conn.stats = stats
+
+    # loop thread only (its handler decided to give it away): stops watching a client without
+    # closing it, the socket is the caller's from here on. returns (frames read from it but not
+    # handled yet, its decoder with the bytes that dont make a whole frame yet)
+    def take_client(self, client_socket):
+        conn = self.connections.pop(client_socket)
+        conn.closing = True  # no more reads, even later in this round of events
+        try:
+            self.selector.unregister(client_socket)
+        except (KeyError, ValueError):
+            pass
+        frames = list(conn.unhandled) if conn.unhandled is not None else []  # dispatch stops there
+        return frames, conn.decoder
+
+    # stop watching a client and close its socket once whatever is queued for it has been written
+    # (so the last results / "bye" still reach it). the loop does the actual close.
+    def close_client(self, client_socket):
+        conn = self.connections.pop(client_socket, None)
+        if conn is None:
+            try:
+                client_socket.close()
+            except OSError:
+                pass
+            return
+
+        with conn.lock:
+            conn.closing = True
+            if conn.out:
+                self.queue_op("linger", conn)
+                return
+        self.queue_op("close", conn)
+
+#===================================================================================================================================
+# SENDING: /////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # queue one or more already encoded frames for a client and write as much as the kernel takes now.
+    # sendmsg gathers the separate buffers so we dont have to join them into a new bytes object,
+    # which means a frame shared by every player (question, scoreboard) is never copied per client.
+    # raises OSError if the client is gone, SlowClientError if it got kicked for being too slow
+    def send(self, client_socket, *frames):
+        conn = self.connections.get(client_socket)
+        if conn is None:
+            raise ConnectionError("client is not connected")
+
+        size = sum(len(f) for f in frames)
+        with conn.lock:
+            if conn.out_bytes + size > self.high_water and not self.make_room(conn, frames, size):
+                return
+
+            was_idle = not conn.out
+            for f in frames:
+                conn.out.append(memoryview(f))
+            conn.out_bytes += size
+
+            if was_idle:
+                # fast path: nothing waiting, so try writing straight from this thread
+                self.flush(conn)
+                if conn.out:
+                    self.queue_op("write", conn)
+
+    # what to do when a client's queue is over high_water. returns True if the new frames can be queued
+    def make_room(self, conn, frames, size):
+        if self.slow_policy == "drop":
+            conn.dropped += len(frames)
+            self.metrics.dropped_frames.inc(len(frames))
+            return False
+
+        if self.slow_policy == "coalesce" and any(f[0] == Kind.BOARD for f in frames):
+            # an old scoreboard nobody has seen yet is useless once a newer one exists
+            # (the client notices the missing delta and asks for a snapshot, see BoardStream.py)
+            kept = deque()
+            for i, buf in enumerate(conn.out):
+                if buf[0] == Kind.BOARD and not (i == 0 and conn.partial):
+                    conn.out_bytes -= len(buf)
+                    self.metrics.coalesced_frames.inc()
+                else:
+                    kept.append(buf)
+            conn.out = kept
+            if conn.out_bytes + size <= self.high_water:
+                return True
+
+        # "disconnect", or coalescing wasnt enough
+        conn.out.clear()
+        conn.out_bytes = 0
+        conn.partial = False
+        self.metrics.slow_evictions.inc()
+        raise SlowClientError("client is too slow to keep up")
+
+    # write queued frames until the queue is empty or the socket would block (call with conn.lock held)
+    def flush(self, conn):
+        calls = 0
+        total = 0
+        out = conn.out
+        try:
+            while out:
+                try:
+                    if HAS_SENDMSG:
+                        sent = conn.sock.sendmsg(list(islice(out, MAX_IOV)))
+                    else:
+                        sent = conn.sock.send(out[0])
+                except (BlockingIOError, InterruptedError):
+                    break
+                calls += 1
+                total += sent
+                conn.out_bytes -= sent
+
+                # drop what went out, keep the unsent tail of a half written frame
+                while out and sent >= len(out[0]):
+                    sent -= len(out.popleft())
+                    conn.partial = False
+                if sent:
+                    out[0] = out[0][sent:]
+                    conn.partial = True
+        finally:
+            self.stats.add(calls, total)
+            if conn.stats is not None:
+                conn.stats.add(calls, total)
+
+    def apply_pending(self):
+        while self.pending:
+            op, conn = self.pending.popleft()
+            try:
+                if op == "add":
+                    frames = ()
+                    if conn.__class__ is tuple:
+                        conn, frames = conn
+                    self.selector.register(conn.sock, selectors.EVENT_READ, conn)
+                    self.dispatch(conn, frames, time.perf_counter())
+                elif op == "listen":
+                    self.selector.register(conn.sock, selectors.EVENT_READ, conn)
+                elif op == "write":
+                    self.selector.modify(conn.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, conn)
+                elif op == "linger":
+                    # gave it enough time after this, drop whatever is left
+                    conn.close_timer = self.call_later(LINGER_SECONDS, self.finish_close, conn)
+                    self.selector.modify(conn.sock, selectors.EVENT_WRITE, conn)
+                else:  # close
+                    self.finish_close(conn)
+            except (KeyError, ValueError, OSError):
+                pass  # socket already closed or already unregistered
+
+    def finish_close(self, conn):
+        if conn.close_timer is not None:
+            conn.close_timer.cancel()
+        try:
+            self.selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            conn.sock.close()
+        except OSError:
+            pass
+
+#===================================================================================================================================
+# THE LOOP: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    def run(self):
+        while self.running:
+            self.apply_pending()
+
+            # sleep until a socket is ready or the next timer is due
+            timeout = self.run_timers()
+            if self.pending:
+                timeout = 0  # a timer queued ops (queue_op doesnt wake the loop from its own thread)
+
+            try:
+                events = self.selector.select(timeout=timeout)
+            except OSError:
+                continue  # a socket got closed under us, the next apply_pending cleans it up
+
+            for key, mask in events:
+                if key.fileobj is self.wake_r:
+                    self.drain_wakeups()
+                    continue
+                conn = key.data
+                if conn.__class__ is Listener:
+                    self.accept_clients(conn)
+                    continue
+                if mask & selectors.EVENT_WRITE:
+                    self.write_client(conn)
+                if mask & selectors.EVENT_READ and not conn.closing:
+                    self.read_client(conn)
+
+        # loop finished: close everything we were watching
+        self.apply_pending()
+        for key in list(self.selector.get_map().values()):
+            if key.data.__class__ is Connection:
+                self.finish_close(key.data)
+            elif key.data is not None:
+                self.selector.unregister(key.fileobj)  # the listening socket belongs to whoever made it
+        self.selector.unregister(self.wake_r)
+
+    def drain_wakeups(self):
+        try:
+            while self.wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def accept_clients(self, listener):
+        for _ in range(listener.batch):
+            try:
+                client_socket, address = listener.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return  # accepted everyone who was waiting
+            except OSError:
+                if listener.sock.fileno() == -1:
+                    self.selector.unregister(listener.sock)  # server socket closed, stop watching it
+                return  # out of fds / aborted connection, try again next wakeup
+            self.metrics.accepts.inc()
+            try:
+                listener.on_accept(client_socket, address)
+            except Exception:
+                traceback.print_exc()
+                client_socket.close()
+
+    def write_client(self, conn):
+        with conn.lock:
+            try:
+                self.flush(conn)
+            except OSError:
+                conn.out.clear()
+                conn.out_bytes = 0
+                if not conn.closing:
+                    self.drop_client(conn)
+                    return
+            done = not conn.out
+
+        if not done:
+            return
+        if conn.closing:
+            self.finish_close(conn)
+        else:
+            self.selector.modify(conn.sock, selectors.EVENT_READ, conn)  # nothing left to write
+
+    def read_client(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+            arrived = time.perf_counter()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+
+        try:
+            frames = conn.decoder.feed(data) if data else None
+        except ProtocolError:
+            frames = None  # garbage on the wire, treat it like a disconnect
+
+        if frames is None:
+            # peer closed (or socket broke): stop watching it and tell the game
+            self.drop_client(conn)
+            return
+
+        self.metrics.bytes_received.inc(len(data))
+        self.metrics.frames_received.inc(len(frames))
+        self.dispatch(conn, frames, arrived)
+
+    def dispatch(self, conn, frames, arrived):
+        conn.unhandled = frames = iter(frames)  # take_client takes whatever is left in it
+        for kind, payload in frames:
+            if conn.closing:
+                break  # rejected / handed over by an earlier frame
+            try:
+                conn.handler.handle_frame(conn.sock, kind, payload, arrived)  # re-read: the handshake swaps it for the room
+            except Exception:
+                traceback.print_exc()  # a bug in one room must not kill the loop for everybody
+        conn.unhandled = None
+
+    def drop_client(self, conn):
+        try:
+            self.selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            conn.handler.handle_disconnect(conn.sock)
+        except Exception:
+            traceback.print_exc()
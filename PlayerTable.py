@@ -0,0 +1,121 @@
+from array import array
+
+# everyone in a room, one row per player. a player is a small int id (reused after they leave),
+# and their round state lives in columns indexed by it:
+#   names[id]        username (None = free row)
+#   sockets[id]      client socket (None while away: dropped mid game, can still resume)
+#   answers[id]      this round's answer letter as one byte ("?" if it wasnt ascii or was NUL), 0 = no answer yet
+#   answered_at[id]  time.perf_counter() when the network loop read that answer off the socket
+# so a join check is one dict lookup by name and grading walks the ids that answered (in the
+# order they answered) over flat arrays instead of hashing sockets.
+# reads like a dict {client_socket: username} of the connected players for everything else.
+# not thread safe, the room uses it under its lock.
+
+
+class PlayerTable:
+    __slots__ = ("ids", "by_name", "names", "sockets", "answers", "answered_at", "answer_order", "free")
+
+    def __init__(self):
+        self.ids = {}       # {client_socket: id} connected players
+        self.by_name = {}   # {username: id} connected and away players
+        self.names = []
+        self.sockets = []
+        self.answers = bytearray()
+        self.answered_at = array("d")
+        self.answer_order = []  # ids that answered this round, first answer first
+        self.free = []          # rows to reuse
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, client_socket):
+        return client_socket in self.ids
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __getitem__(self, client_socket):
+        return self.names[self.ids[client_socket]]
+
+    def get(self, client_socket, default=None):
+        pid = self.ids.get(client_socket)
+        return default if pid is None else self.names[pid]
+
+    def keys(self):
+        return self.ids.keys()
+
+    def values(self):
+        names = self.names
+        return [names[pid] for pid in self.ids.values()]
+
+    def items(self):
+        names = self.names
+        return [(s, names[pid]) for s, pid in self.ids.items()]
+
+    def has_name(self, username):
+        return username in self.by_name
+
+#===================================================================================================================================
+# ROWS: ///////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # returns the player's id
+    def add(self, client_socket, username):
+        if self.free:
+            pid = self.free.pop()
+            self.names[pid] = username
+            self.sockets[pid] = client_socket
+            self.answers[pid] = 0
+            self.answered_at[pid] = 0.0
+        else:
+            pid = len(self.names)
+            self.names.append(username)
+            self.sockets.append(client_socket)
+            self.answers.append(0)
+            self.answered_at.append(0.0)
+        self.ids[client_socket] = pid
+        self.by_name[username] = pid
+        return pid
+
+    # connected player leaves for good, returns their username (None if the socket isnt here)
+    def remove(self, client_socket):
+        pid = self.ids.pop(client_socket, None)
+        if pid is None:
+            return None
+        return self.forget(pid)
+
+    # frees the row of a connected or away player
+    def forget(self, pid):
+        username = self.names[pid]
+        self.ids.pop(self.sockets[pid], None)
+        del self.by_name[username]
+        self.names[pid] = None
+        self.sockets[pid] = None
+        self.answers[pid] = 0  # an answer from this round no longer counts
+        self.free.append(pid)
+        return username
+
+    # connection dropped: the row (name, this round's answer) stays, returns the id
+    def detach(self, client_socket):
+        pid = self.ids.pop(client_socket)
+        self.sockets[pid] = None
+        return pid
+
+    # back on a new socket
+    def attach(self, pid, client_socket):
+        self.sockets[pid] = client_socket
+        self.ids[client_socket] = pid
+
+#===================================================================================================================================
+# ROUNDS: /////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    def new_round(self):
+        self.answers = bytearray(len(self.names))
+        self.answer_order = []
+
+    def answer(self, pid, letter, when):
+        code = ord(letter)
+        # 0 is "no answer yet", a NUL answer stored as 0 could be sent again and again (and count
+        # down the round every time). only A / B / C can be right anyway
+        self.answers[pid] = code if 0 < code < 128 else 63
+        self.answered_at[pid] = when
+        self.answer_order.append(pid)
@@ -0,0 +1,107 @@
+import struct
+from enum import IntEnum
+
+# shared by Server.py and Client.py
+#
+# every message on the wire is one frame:
+#   [kind: 1 byte][payload length: 4 bytes, big endian][payload: utf-8 text]
+# so the receiver never has to guess where a message ends, no matter how TCP
+# splits or glues the writes together.
+
+HEADER = struct.Struct("!BI")
+HEADER_SIZE = HEADER.size
+MAX_PAYLOAD = 1 << 20  # 1 MiB, anything bigger is a broken or hostile peer
+
+
+class Kind(IntEnum):
+    JOIN = 1        # client -> server: username
+    ANSWER = 2      # client -> server: "A" / "B" / "C"
+    QUESTION = 3    # server -> client: the question screen
+    SCOREBOARD = 4  # server -> client: whole scoreboard as text (old servers, BOARD replaced it)
+    FEEDBACK = 5    # server -> client: right / wrong for this player
+    RESULTS = 6     # server -> client: final rankings
+    ERROR = 7       # server -> client: join rejected etc, connection closes after it
+    INFO = 8        # server -> client: welcome, joins / leaves, bye
+    TIMER = 9       # server -> client: whole seconds left to answer the current question
+    RESUME = 10     # client -> server: instead of JOIN, "room code\nusername\nsession token"
+    SESSION = 11    # server -> client: session token, send it in RESUME to get back into a running game
+    BOARD = 12      # server -> client: scoreboard snapshot or delta with a sequence number (BoardStream.py)
+    RESYNC = 13     # client -> server: missed a BOARD delta, send a snapshot
+
+
+KINDS = frozenset(int(k) for k in Kind)
+
+# JOIN payload is "username", or "room code\nusername" to pick a room
+DEFAULT_ROOM = "main"
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(kind, payload):
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"payload too big ({len(payload)} bytes)")
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+def join_payload(username, room=""):
+    room = room.strip()
+    return f"{room}\n{username}" if room else username
+
+
+# returns (room code, username)
+def parse_join(payload):
+    room, sep, username = payload.partition("\n")
+    if not sep:
+        room, username = "", room
+    return (room.strip() or DEFAULT_ROOM), username.strip()
+
+
+def resume_payload(username, token, room=""):
+    return f"{room.strip() or DEFAULT_ROOM}\n{username}\n{token}"
+
+
+# returns (room code, username, token)
+def parse_resume(payload):
+    rest, _, token = payload.rpartition("\n")
+    room, username = parse_join(rest)
+    return room, username, token.strip()
+
+
+# incremental decoder: feed it whatever recv() returned, get back every complete frame in it.
+# partial frames stay buffered until the rest arrives.
+class FrameDecoder:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        buf = self.buffer
+        buf += data
+
+        frames = []
+        offset = 0
+        end = len(buf)
+
+        # walk the buffer with offsets instead of slicing it after every frame,
+        # then drop everything we consumed in one go at the end
+        with memoryview(buf) as view:
+            while end - offset >= HEADER_SIZE:
+                kind, length = HEADER.unpack_from(buf, offset)
+                if kind not in KINDS:
+                    raise ProtocolError(f"unknown frame kind {kind}")
+                if length > MAX_PAYLOAD:
+                    raise ProtocolError(f"frame too big ({length} bytes)")
+
+                start = offset + HEADER_SIZE
+                if end - start < length:
+                    break  # rest of this frame hasnt arrived yet
+
+                frames.append((Kind(kind), str(view[start:start + length], "utf-8", "replace")))
+                offset = start + length
+
+        if offset:
+            del buf[:offset]
+        return frames
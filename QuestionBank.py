@@ -0,0 +1,211 @@
+import hashlib
+import io
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+
+# question files are parsed and checked once, then compiled into a sidecar file next to them
+# ("questions.txt" -> "questions.txt.qbank"). later loads (and other rooms, and the next server run)
+# just map the compiled file and decode a question when it is asked, so a bank with 100k+
+# questions costs an offset table in memory, not 100k dicts.
+#
+# question file format, one record per question, blank lines between records are fine:
+#   What is the largest planet in our solar system?
+#   A - Saturn
+#   B - Neptune
+#   C - Jupiter
+#   Correct answer: C          ("Correct: C" / "Answer: C" work too)
+#
+# compiled file:
+#   [header][record bytes ...][offsets: count+1 little endian uint64]
+# a record is "question\x1fA\x1fB\x1fC\x1fcorrect letter" in utf-8, record i is
+# data[offsets[i]:offsets[i+1]].
+
+MAGIC = b"SQB1"
+HEADER = struct.Struct("<4sQQ32sQQ")  # magic, source mtime_ns, source size, source sha256, count, offsets position
+OFFSET = struct.Struct("<Q")
+SEP = "\x1f"
+SUFFIX = ".qbank"
+LINES_PER_QUESTION = 5
+
+ANSWER_RE = re.compile(r"^(?:correct(?:\s+answer)?|answer)\s*[:\-=]?\s*([ABC])\W*$", re.IGNORECASE)
+
+
+# the question file is broken, message says where
+class QuestionError(ValueError):
+    pass
+
+
+# read only view of a compiled bank. bank[i] -> {"question", "options", "correct_option"}
+class QuestionBank:
+    def __init__(self, filename, buffer, key):
+        self.filename = filename
+        self.buffer = buffer  # mmap of the sidecar, or bytes if it couldnt be written
+        self.key = key        # (mtime_ns, size) of the source it was built from
+
+        _, _, _, _, self.count, self.offsets_pos = HEADER.unpack_from(buffer, 0)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(f"question {index} out of range")
+        pos = self.offsets_pos + index * OFFSET.size
+        start, = OFFSET.unpack_from(self.buffer, pos)
+        end, = OFFSET.unpack_from(self.buffer, pos + OFFSET.size)
+        question, a, b, c, correct = str(self.buffer[start:end], "utf-8").split(SEP)
+        return {"question": question, "options": [a, b, c], "correct_option": correct}
+
+
+#===================================================================================================================================
+# PARSING: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+# yields (question, [A, B, C], correct letter) for every record, raises QuestionError on the first bad one
+def parse_questions(file, filename="questions"):
+    record = []
+    first_line = 0
+    for line_no, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if not record:
+            first_line = line_no
+        record.append(line)
+
+        match = ANSWER_RE.match(line)
+        if len(record) < LINES_PER_QUESTION:
+            # an answer line this early means the record lost a line, dont let everything after it shift
+            if match:
+                raise QuestionError(f"{filename} line {line_no}: question starting on line {first_line} "
+                                    f"has {len(record) - 1} lines before its answer, expected {LINES_PER_QUESTION - 1}")
+            continue
+
+        if not match:
+            raise QuestionError(f"{filename} line {line_no}: expected 'Correct answer: A/B/C', got '{line}'")
+        if any(SEP in part for part in record):
+            raise QuestionError(f"{filename} line {first_line}: question contains a control character")
+        yield record[0], record[1:4], match.group(1).upper()
+        record = []
+
+    if record:
+        raise QuestionError(f"{filename} line {first_line}: last question is incomplete "
+                            f"({len(record)} of {LINES_PER_QUESTION} lines)")
+
+
+#===================================================================================================================================
+# COMPILING: //////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+def file_hash(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+# parses the source and writes the compiled bank to out (any binary file object, must be seekable)
+def compile_bank(filename, out, stat, sha):
+    offsets = array("Q")
+    out.write(b"\0" * HEADER.size)
+    pos = HEADER.size
+
+    with open(filename, "r", encoding="utf-8") as file:
+        for question, options, correct in parse_questions(file, os.path.basename(filename)):
+            offsets.append(pos)
+            data = SEP.join((question, *options, correct)).encode("utf-8")
+            out.write(data)
+            pos += len(data)
+
+    count = len(offsets)
+    if not count:
+        raise QuestionError(f"{os.path.basename(filename)}: no questions in file")
+
+    offsets.append(pos)
+    if sys.byteorder == "big":
+        offsets.byteswap()  # the file is little endian everywhere
+    out.write(offsets.tobytes())
+
+    out.seek(0)
+    out.write(HEADER.pack(MAGIC, stat.st_mtime_ns, stat.st_size, sha, count, pos))
+
+
+# header of an existing sidecar, None if it is missing or not ours
+def read_header(path):
+    try:
+        with open(path, "rb") as file:
+            header = file.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) != HEADER.size or header[:4] != MAGIC:
+        return None
+    return HEADER.unpack(header)
+
+
+def map_file(path):
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# returns the compiled bank for filename, building / refreshing the sidecar if the source changed
+def build_bank(filename):
+    stat = os.stat(filename)
+    key = (stat.st_mtime_ns, stat.st_size)
+    sidecar = filename + SUFFIX
+
+    header = read_header(sidecar)
+    if header is not None:
+        _, mtime_ns, size, sha, _, _ = header
+        if (mtime_ns, size) == key:
+            return QuestionBank(filename, map_file(sidecar), key)
+
+        # touched but not edited (copied, checked out again): same content, just stamp the new mtime
+        if size == stat.st_size and sha == file_hash(filename):
+            try:
+                with open(sidecar, "r+b") as file:
+                    file.write(HEADER.pack(header[0], stat.st_mtime_ns, stat.st_size, *header[3:]))
+                return QuestionBank(filename, map_file(sidecar), key)
+            except OSError:
+                pass
+
+    sha = file_hash(filename)
+    tmp = f"{sidecar}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w+b") as out:
+            compile_bank(filename, out, stat, sha)
+        os.replace(tmp, sidecar)  # readers never see a half written bank
+        return QuestionBank(filename, map_file(sidecar), key)
+    except QuestionError:
+        raise
+    except OSError:
+        pass  # read only directory etc, compile into memory instead
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    out = io.BytesIO()
+    compile_bank(filename, out, stat, sha)
+    return QuestionBank(filename, out.getvalue(), key)
+
+
+#===================================================================================================================================
+# LOADING: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+banks = {}  # {absolute path: QuestionBank} shared by every room in the process
+banks_lock = threading.Lock()
+
+
+# what rooms call on START GAME. raises OSError if the file cant be read, QuestionError if it is broken
+def load_bank(filename):
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    with banks_lock:
+        bank = banks.get(path)
+        if bank is not None and bank.key == (stat.st_mtime_ns, stat.st_size):
+            return bank
+        bank = banks[path] = build_bank(path)
+        return bank
@@ -0,0 +1,185 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+# finished games don't disappear anymore: every game, every answer (with how long it took) and
+# every final score goes into a SQLite file.
+#  - WAL journal, so leaderboard reads never block the game threads writing
+#  - one transaction per round (executemany for all the players' answers)
+#  - leaderboards read running totals (all time / per bank / per day) that are updated when a
+#    game ends, each with an index on score, so top k is an index walk, not a scan of history
+#
+#   python -m ResultsStore quiz_results.db --top 10 [--bank questions.txt] [--day 2026-10-18]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    room TEXT NOT NULL,
+    bank TEXT NOT NULL,
+    day TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    questions INTEGER NOT NULL,
+    players INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS answers (
+    game_id TEXT NOT NULL REFERENCES games(id),
+    round INTEGER NOT NULL,
+    question INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    answer TEXT,
+    correct INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    seconds REAL
+);
+CREATE INDEX IF NOT EXISTS answers_game ON answers(game_id, round);
+CREATE TABLE IF NOT EXISTS results (
+    game_id TEXT NOT NULL REFERENCES games(id),
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (game_id, player)
+);
+CREATE TABLE IF NOT EXISTS totals_all (
+    player TEXT PRIMARY KEY,
+    score INTEGER NOT NULL,
+    games INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS totals_all_score ON totals_all(score DESC);
+CREATE TABLE IF NOT EXISTS totals_bank (
+    bank TEXT NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (bank, player)
+);
+CREATE INDEX IF NOT EXISTS totals_bank_score ON totals_bank(bank, score DESC);
+CREATE TABLE IF NOT EXISTS totals_day (
+    day TEXT NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (day, player)
+);
+CREATE INDEX IF NOT EXISTS totals_day_score ON totals_day(day, score DESC);
+"""
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = path
+        # one connection shared by every room, the lock keeps their transactions apart
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")  # durable at every checkpoint, no fsync per round
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # runs fn(cursor) in one transaction
+    def write(self, fn):
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("BEGIN")
+            try:
+                fn(cur)
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+
+#===================================================================================================================================
+# WRITING (called by the game threads): ///////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # returns the new game's id
+    def start_game(self, room, bank, questions, players):
+        game_id = uuid.uuid4().hex
+        now = time.time()
+        day = time.strftime("%Y-%m-%d", time.localtime(now))
+        self.write(lambda cur: cur.execute(
+            "INSERT INTO games (id, room, bank, day, started, questions, players) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (game_id, room, bank, day, now, questions, players)))
+        return game_id
+
+    # rows: [(player, answer or None, correct, points, seconds to answer or None)]
+    def record_round(self, game_id, round_no, question, rows):
+        self.write(lambda cur: cur.executemany(
+            "INSERT INTO answers (game_id, round, question, player, answer, correct, points, seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(game_id, round_no, question, player, answer, int(correct), points, seconds)
+             for player, answer, correct, points, seconds in rows]))
+
+    # final: [(player, score, rank)], also adds the scores to the leaderboards
+    def finish_game(self, game_id, final):
+        def finish(cur):
+            cur.execute("UPDATE games SET ended = ? WHERE id = ?", (time.time(), game_id))
+            bank, day = cur.execute("SELECT bank, day FROM games WHERE id = ?", (game_id,)).fetchone()
+            cur.executemany("INSERT OR REPLACE INTO results (game_id, player, score, rank) VALUES (?, ?, ?, ?)",
+                            [(game_id, player, score, rank) for player, score, rank in final])
+            cur.executemany("INSERT INTO totals_all (player, score, games) VALUES (?, ?, 1) "
+                            "ON CONFLICT(player) DO UPDATE SET score = score + excluded.score, games = games + 1",
+                            [(player, score) for player, score, _ in final])
+            cur.executemany("INSERT INTO totals_bank (bank, player, score, games) VALUES (?, ?, ?, 1) "
+                            "ON CONFLICT(bank, player) DO UPDATE SET score = score + excluded.score, games = games + 1",
+                            [(bank, player, score) for player, score, _ in final])
+            cur.executemany("INSERT INTO totals_day (day, player, score, games) VALUES (?, ?, ?, 1) "
+                            "ON CONFLICT(day, player) DO UPDATE SET score = score + excluded.score, games = games + 1",
+                            [(day, player, score) for player, score, _ in final])
+        self.write(finish)
+
+#===================================================================================================================================
+# LEADERBOARDS: [(player, score, games)] best first ///////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    def query(self, sql, args):
+        with self.lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def top_all_time(self, k=10):
+        return self.query("SELECT player, score, games FROM totals_all ORDER BY score DESC LIMIT ?", (k,))
+
+    def top_bank(self, bank, k=10):
+        return self.query("SELECT player, score, games FROM totals_bank WHERE bank = ? ORDER BY score DESC LIMIT ?", (bank, k))
+
+    def top_day(self, day, k=10):
+        return self.query("SELECT player, score, games FROM totals_day WHERE day = ? ORDER BY score DESC LIMIT ?", (day, k))
+
+    # [(player, score, rank)] of one game
+    def game_results(self, game_id):
+        return self.query("SELECT player, score, rank FROM results WHERE game_id = ? ORDER BY rank, player", (game_id,))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ResultsStore", description="SUquid Quiz leaderboards")
+    parser.add_argument("db", help="results database (see --results-db)")
+    parser.add_argument("--top", type=int, default=10, help="how many players to show (default 10)")
+    parser.add_argument("--bank", help="only games played with this question file")
+    parser.add_argument("--day", help="only games played on this day (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"no results database at {args.db}", file=sys.stderr)
+        return 1
+
+    store = ResultsStore(args.db)
+    if args.bank:
+        rows = store.top_bank(args.bank, args.top)
+    elif args.day:
+        rows = store.top_day(args.day, args.top)
+    else:
+        rows = store.top_all_time(args.top)
+    store.close()
+
+    for i, (player, score, games) in enumerate(rows, 1):
+        print(f"{i:>3}. {player:<20} {score:>6} points in {games} games")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,736 @@
+import cProfile
+import math
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+import NumpyGrading
+from BoardStream import BoardFeed
+from NumpyGrading import FIRST, LATE, RIGHT, WRONG
+from LogSink import DEBUG, ERROR, INFO, WARNING
+from Network import IOStats, SlowClientError
+from PlayerTable import PlayerTable
+from Protocol import Kind, encode_frame
+from QuestionBank import load_bank
+from Scoreboard import Scoreboard
+from Tracing import NO_TRACE, Tracer
+
+TIMER_TICK = 5 # seconds between "time left" pushes while a question has a time limit
+QUESTION_CACHE_SIZE = 4096 # rendered questions kept around (shared by every room)
+BOARD_SIZE = 10 # players shown on the scoreboard / results, everyone also gets their own rank
+RESUME_GRACE = 60 # seconds a player who dropped mid game keeps their place and score
+JOIN_ANNOUNCE_DELAY = 0.2 # joins this close together are announced to the room in one message
+JOIN_ANNOUNCE_NAMES = 10 # names listed in that message, the rest is just counted
+
+
+# the question screen (see display_question) rendered and utf-8 encoded once per question,
+# split around the question number so any round can reuse it: returns (bytes before, bytes after)
+@lru_cache(maxsize=QUESTION_CACHE_SIZE)
+def render_question(bank, file_q_index):
+    q = bank[file_q_index]
+    line = "=" * len(q["question"])
+    head = f"[QUESTION]\n{line}\nQuestion "
+    tail = "\n" + "\n".join((q["question"], *q["options"], line + "\n"))
+    return head.encode("utf-8"), tail.encode("utf-8")
+
+
+# one quiz game: its players, scores, questions and the game flow.
+# the server (Engine.py) owns the listening socket and the network loop and routes players
+# to rooms by the code they send in JOIN, so many rooms can run in one process.
+#
+# the network loop calls handle_frame / handle_disconnect directly as soon as something arrives,
+# so there is no inbox to poll: an answer is recorded the moment it is read, and the last answer
+# of a round wakes the game thread through round_done.
+#
+# with a time limit the round also ends at its deadline: the deadline and the countdown pushes
+# are timers on the network loop (NetworkCore.call_later), not a sleeping thread per room.
+#
+# every player gets a session token when they join (SESSION frame). if their connection drops
+# during a game they stay "away" for host.resume_grace seconds: score kept, not waited for.
+# a RESUME with the token puts them back: they get their score and the open question, nothing more.
+#
+# host is the object that owns the room, the room only uses:
+#   host.network               - the shared NetworkCore
+#   host.metrics               - the shared ServerMetrics
+#   host.trace_dir             - write a Chrome trace of every game there (None = off)
+#   host.profile               - cProfile the game thread and dump it there (or in the cwd)
+#   host.results               - ResultsStore that keeps every game's answers and scores (None = off)
+#   host.resume_grace          - seconds a dropped player can come back in (0 = never)
+#   host.log_message(msg, level, room code) - logging
+#   host.room_changed(room)    - players joined / left (enable START GAME etc)
+#   host.room_finished(room)   - a game ended
+class GameRoom:
+    def __init__(self, host, code):
+        self.host = host
+        self.network = host.network
+        self.metrics = host.metrics
+        self.code = code
+
+        self.players = PlayerTable()  # id per player + columns for the round (PlayerTable.py), reads like {client_socket: name}
+        self.scores = Scoreboard()  # players still in the game, kept sorted (Scoreboard.py)
+        self.all_time_scores = Scoreboard() #stores all scores recorded during the game
+        self.board = BoardFeed(BOARD_SIZE)  # what the players were told about self.scores, as snapshot + deltas (BoardStream.py)
+        self.questions = []
+
+        self.n_questions = 0 # questions in game
+        self.questions_in_file = 0 # questions in the file
+
+        self.expected = set()   # player ids that still count for the current round
+        self.waiting = 0        # how many of them havent answered yet
+        self.collecting = False # True while a round is waiting for answers
+        self.round_done = threading.Event() # set when everyone expected has answered (or left), or time is up
+        self.round_id = 0       # old timers check it so they cant touch a newer round
+        self.time_limit = None  # seconds per question, None = wait for everyone
+        self.deadline = None    # time.monotonic() when the current round closes
+        self.clock = None       # next countdown / deadline timer of the current round
+        self.current_question = None # (file index, number in game) of the last question asked
+
+        self.sessions = {}      # {username: session token} handed out at join
+        self.away = {}          # {player id: grace timer} dropped mid game, can still resume
+        self.joined = []        # usernames that joined since the last "joined the game" message
+        self.join_timer = None
+
+        self.game_started = False
+        self.game_ended = False
+        self.accepting_clients = True
+
+        # the network thread (frames, joins, timers) and the game thread both touch the dicts above.
+        # never call into the host while holding it (the host locks its rooms dict and calls us)
+        self.lock = threading.RLock()
+        self.stats = IOStats()  # writes to this room's players, per round
+        self.vector_grading = True  # grade big rounds with NumPy when it is installed (NumpyGrading.py)
+        self.tracer = NO_TRACE  # a Tracer while a traced game runs
+        self.round_stats = []   # [(send syscalls, bytes sent, players)] one per round of the last game
+
+        # for the results store (ResultsStore.py), only filled in while a stored game runs
+        self.game_id = None     # the game's id in the store
+        self.asked_at = 0.0     # time.perf_counter() when the current question went out
+        self.round_rows = []    # [(player, answer, correct, points, seconds)] of the last graded round
+
+#===================================================================================================================================
+# LOG: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    def log_message(self, message, level=INFO):
+        if isinstance(message, list):
+            self.host.log_message([f"[{self.code}] {line}" for line in message], level, self.code)
+        else:
+            self.host.log_message(f"[{self.code}] {message}", level, self.code)
+
+#===================================================================================================================================
+# PLAYERS: ////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # returns an error message if the player cant join this room, None if they can
+    def check_join(self, username):
+        with self.lock:
+            if not self.accepting_clients:
+                return "game ongoing u cant join"
+            if self.players.has_name(username):
+                return f"ERROR: Username '{username}' already connected"
+        return None
+
+    # the socket is already validated and handed to the network loop
+    def add_player(self, client_socket, username):
+        token = secrets.token_urlsafe(16)
+        with self.lock:
+            self.players.add(client_socket, username)
+            self.sessions[username] = token
+            # one message per burst of joins instead of one broadcast to the whole room per join
+            self.joined.append(username)
+            if self.join_timer is None:
+                self.join_timer = self.network.call_later(JOIN_ANNOUNCE_DELAY, self.announce_joins)
+            # under the lock: the board snapshot cant be overtaken by a newer delta (see BoardFeed)
+            self.network.send(client_socket, encode_frame(Kind.INFO, f"Welcome {username}! *-*"), encode_frame(Kind.SESSION, token),
+                              self.board.snapshot())
+        self.host.room_changed(self)
+
+    # timer (network thread)
+    def announce_joins(self):
+        with self.lock:
+            names, self.joined = self.joined, []
+            self.join_timer = None
+        if len(names) == 1:
+            self.broadcast(f"player {names[0]} joined the game")
+        elif names:
+            listed = ", ".join(names[:JOIN_ANNOUNCE_NAMES])
+            more = len(names) - JOIN_ANNOUNCE_NAMES
+            self.broadcast(f"players {listed} and {more} more joined the game" if more > 0 else f"players {listed} joined the game")
+
+    #fucntion to eemove the client from dicts and notify server and players
+    # grace: the connection dropped, during a game the player can still RESUME for a while
+    def remove_client(self, client_socket, reason="got disconnected", grace=False):
+        grace_seconds = self.host.resume_grace
+        with self.lock:
+            pid = self.players.ids.get(client_socket)
+            username = None if pid is None else self.players.names[pid]
+
+            # the round shouldnt wait for someone who left
+            if pid is not None:
+                self.stop_waiting(pid)
+
+            away = grace and grace_seconds and pid is not None and self.game_started and not self.game_ended
+            if away:
+                # row and score stay, expire_session takes them off if they dont come back
+                self.players.detach(client_socket)
+                self.away[pid] = self.network.call_later(grace_seconds, self.expire_session, pid)
+            elif pid is not None:
+                self.players.remove(client_socket)
+                if username in self.scores:
+                    self.scores.remove(username)
+                self.sessions.pop(username, None)
+                self.metrics.answer_latency.remove(self.latency_label(username))
+
+        # close socket (the network loop closes it after writing whatever is still queued for it)
+        self.network.close_client(client_socket)
+
+        # announce
+        if username:
+            self.metrics.disconnects.inc(1, reason)
+            if away:
+                self.log_message(f"'{username}' dropped ({reason}), can resume for {grace_seconds:g}s.")
+                self.broadcast(f"player '{username}' lost connection, waiting for them to come back.")
+            else:
+                self.log_message(f"'{username}' left the game ({reason}).")
+                self.broadcast(f"player '{username}' left the game ({reason}).")
+
+        if not self.game_ended:
+            self.host.room_changed(self)
+
+    # everyone out at once (game over, server stopping). they already got a goodbye, so there is
+    # no "player X left" for every one of them to everyone still there (that is N² frames)
+    def remove_all(self, reason):
+        with self.lock:
+            leaving = self.players.items()
+            for client_socket, username in leaving:
+                self.stop_waiting(self.players.ids[client_socket])
+                self.players.remove(client_socket)
+                if username in self.scores:
+                    self.scores.remove(username)
+                self.sessions.pop(username, None)
+                self.metrics.answer_latency.remove(self.latency_label(username))
+
+        for client_socket, username in leaving:
+            self.network.close_client(client_socket)
+            self.log_message(f"'{username}' left the game ({reason}).", DEBUG)
+        if leaving:
+            self.metrics.disconnects.inc(len(leaving), reason)
+            self.log_message(f"{len(leaving)} players left the game ({reason}).")
+
+    # grace timer (network thread): they didnt come back in time
+    def expire_session(self, pid):
+        with self.lock:
+            if self.away.pop(pid, None) is None:
+                return  # resumed, or the game ended
+            username = self.players.forget(pid)
+            if username in self.scores:
+                self.scores.remove(username)
+            self.sessions.pop(username, None)
+            self.metrics.answer_latency.remove(self.latency_label(username))
+
+        self.log_message(f"'{username}' did not come back, removed from the game.")
+        self.broadcast(f"player '{username}' left the game (did not come back).")
+        self.host.room_changed(self)
+
+    # checks a RESUME: returns the player's id (their row is still there, only the socket changes)
+    # or None if there is nothing to resume (then its treated like a JOIN)
+    def claim_session(self, username, token):
+        old_socket = None
+        with self.lock:
+            expected = self.sessions.get(username)
+            if expected is None or not token or not secrets.compare_digest(expected, token):
+                return None
+            pid = self.players.by_name[username]
+            timer = self.away.pop(pid, None)
+            if timer is not None:
+                timer.cancel()
+            else:
+                # still "connected": the old connection is dead but the server hasnt noticed yet
+                old_socket = self.players.sockets[pid]
+                self.players.detach(old_socket)
+        if old_socket is not None:
+            self.network.close_client(old_socket)
+        return pid
+
+    # puts a resumed player back on a new socket (already handed to the network loop):
+    # one write with their score / rank, the board and, if a round is open, the question and the time left
+    def resume_player(self, client_socket, pid):
+        with self.lock:
+            self.players.attach(pid, client_socket)
+            username = self.players.names[pid]
+            welcome = f"Welcome back {username}!"
+            if username in self.scores:
+                welcome += " " + self.rank_line(self.scores, username)
+            frames = [encode_frame(Kind.INFO, welcome), self.board.snapshot()]
+
+            # an answer sent before the drop still counts, otherwise they get the question again
+            if self.collecting and not self.players.answers[pid] and self.current_question is not None:
+                if pid not in self.expected:
+                    self.expected.add(pid)
+                    self.waiting += 1
+                frames.append(self.question_frame(*self.current_question))
+                if self.deadline is not None:
+                    frames.append(encode_frame(Kind.TIMER, str(max(0, math.ceil(self.deadline - time.monotonic())))))
+            self.network.send(client_socket, *frames)  # under the lock for the board snapshot, like add_player
+
+        self.log_message(f"'{username}' resumed the game.")
+        self.broadcast(f"player '{username}' is back.")
+        self.host.room_changed(self)
+
+#===================================================================================================================================
+# NETWORK EVENTS (called on the network thread): //////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # arrived: when the network loop read it (the answer's time, whatever happened to it after that)
+    def handle_frame(self, client_socket, kind, payload, arrived):
+        if kind == Kind.RESYNC:
+            self.send_board(client_socket)
+            return
+        if kind != Kind.ANSWER:
+            return
+        msg = payload.strip()
+        if not msg:
+            return
+
+        with self.lock:
+            # ignore answers outside a round, from sockets no longer in game, or second answers
+            pid = self.players.ids.get(client_socket)
+            if not self.collecting or pid not in self.expected or self.players.answers[pid]:
+                return
+
+            self.players.answer(pid, msg[0].upper()[0], arrived)
+            self.waiting -= 1
+            if self.waiting <= 0:
+                self.round_done.set()
+            username = self.players.names[pid]
+            took = arrived - self.asked_at
+            if self.tracer.enabled:
+                self.tracer.instant("answer", player=username, round=self.round_id)
+        self.metrics.answers.inc()
+        self.metrics.answer_latency.observe(took, self.latency_label(username))
+        self.metrics.answer_queue.observe(time.perf_counter() - arrived)
+
+    # a client lost track of the board (missed a delta), it gets the whole thing again
+    def send_board(self, client_socket):
+        try:
+            with self.lock:
+                if client_socket in self.players:
+                    self.network.send(client_socket, self.board.snapshot())
+        except SlowClientError:
+            self.remove_client(client_socket, reason="too slow, couldnt keep up")
+
+    # a player's series in the answer latency histogram, dropped when they leave the room
+    def latency_label(self, username):
+        return f"{self.code}/{username}"
+
+    def handle_disconnect(self, client_socket):
+        if client_socket in self.players:
+            self.remove_client(client_socket, reason="disconnected", grace=True)
+
+#===================================================================================================================================
+# QUESTIONS: //////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+    # gets the question bank (QuestionBank.py), parsed and checked once and shared by every room.
+    # raises OSError (FileNotFoundError, PermissionError..) if it cant read it, QuestionError if its broken
+    def load_questions(self, filename):
+        self.questions = load_bank(filename)  # questions are decoded one at a time when asked
+        self.questions_in_file = len(self.questions)
+
+        self.log_message(f"file {filename} opened successfully")
+        self.log_message(f"number of questions in file: {self.questions_in_file}")
+
+#==================================================================================================================================
+# GAME FLOW DISPLAY HELPERS: broadcast, display scoreboard, display question, dislay rankings /////////////////////////////////////
+#==================================================================================================================================
+    # function  to send message to all players
+    # a list of lines goes out as ONE frame so the client gets the whole screen at once.
+    # the frame is encoded once and the same bytes are written to every socket.
+    # personal: {client_socket: encoded frame} sent in front of the shared one in the same write
+    # (used for round feedback + scoreboard, so each player costs one syscall per round not two)
+    def broadcast(self, message, kind=Kind.INFO, personal=None):
+        if isinstance(message, list):
+            message = "\n".join(str(line) for line in message)
+
+        self.broadcast_frame(encode_frame(kind, message), personal)
+
+    # same with a frame that is already encoded
+    def broadcast_frame(self, frame, personal=None):
+        started = time.perf_counter()
+        personal = personal or {}
+        with self.lock:
+            targets = list(self.players.keys())
+
+        for client_socket in targets:
+            try:
+                if client_socket in personal:
+                    self.network.send(client_socket, personal[client_socket], frame)
+                else:
+                    self.network.send(client_socket, frame)
+            except SlowClientError:
+                self.remove_client(client_socket, reason="too slow, couldnt keep up")
+            except (socket.error, OSError):
+                self.remove_client(client_socket, grace=True)
+
+        self.metrics.fanout.observe(time.perf_counter() - started)
+
+    # function to display screboard (the best BOARD_SIZE players, each player gets their rank in the feedback)
+    # only for the log now, the players get self.board's deltas
+    def scoreboard(self, scores, limit=BOARD_SIZE):
+        lines = []
+        lines.append("===== SCOREBOARD =====")
+
+        if not scores:
+            lines.append("No scores to display.")
+            lines.append("======================")
+            return lines
+
+        for username, score in scores.top(limit):
+            lines.append(f"{username:<15} : {score}")
+
+        if len(scores) > limit:
+            lines.append(f"... and {len(scores) - limit} more")
+
+        lines.append("======================")
+
+        return lines
+
+    # the encoded QUESTION frame for a round, only the number is new work (see render_question)
+    def question_frame(self, file_q_index, n_q_game):
+        head, tail = render_question(self.questions, file_q_index)
+        return encode_frame(Kind.QUESTION, b"".join((head, str(n_q_game).encode("ascii"), tail)))
+
+    #function to display question (as lines, question_frame is what the game sends)
+    def display_question(self, file_q_index, n_q_game):
+        q = self.questions[file_q_index]
+        lines = []
+
+        lines.append("[QUESTION]")
+        lines.append("" + "=" * len(q["question"]))
+        lines.append(f"Question {n_q_game}")
+        lines.append("" + q["question"])
+        lines.append("" +q["options"][0])  # OPTION A
+        lines.append("" +q["options"][1])  #  OPTION B
+        lines.append("" +q["options"][2])  # OPTION C
+        lines.append("=" * len(q["question"]) + "\n")
+
+        return lines
+
+    # function to display results and rankings at the end of the game
+    # scores: Scoreboard, already sorted by score desc then name, limit=None shows everyone (for the log)
+    def display_results(self, scores, limit=None):
+        lines = []
+        lines.append("===== GAME OVER =====")
+        lines.append("=== FINAL RESULTS ===")
+
+        for rank, username, pts in scores.ranked(limit):
+            lines.append(f"{rank}. {username} — {pts}")
+
+        if limit is not None and len(scores) > limit:
+            lines.append(f"... and {len(scores) - limit} more")
+
+        return lines
+
+    # "3rd of 10" style line for one player (grade_round builds the same line for everyone at once)
+    def rank_line(self, scores, username, added_points=None):
+        line = f"You are #{scores.rank(username)} of {len(scores)} with {scores[username]} points"
+        if added_points is not None:
+            line += f" (+{added_points})"
+        return line
+
+#==================================================================================================================================
+# GAME LOGIC FUNCTIONS: ///////////////////////////////////////////////////////////////////////////////////////////////////////////
+#=================================================================================================================================
+    # start collecting answers. called BEFORE the question goes out so a fast answer cant be missed
+    def open_round(self):
+        with self.lock:
+            self.round_id += 1
+            self.deadline = None
+            self.players.new_round()
+            #update list each round
+            self.expected = set(self.players.ids.values())
+            self.waiting = len(self.expected)
+            self.round_done.clear()
+            self.collecting = True
+            if not self.waiting:
+                self.round_done.set() # nobody left to ask
+
+    # starts the countdown once the question is out (so everyone gets the full time)
+    def start_clock(self):
+        if not self.time_limit:
+            return
+        with self.lock:
+            if not self.collecting:
+                return
+            self.deadline = time.monotonic() + self.time_limit
+            round_id = self.round_id
+        self.clock_tick(round_id)
+
+    # runs on the game thread for the first push, then on the network loop as a timer:
+    # tells everyone how long is left and schedules the next push, or closes the round at the deadline
+    def clock_tick(self, round_id):
+        with self.lock:
+            if not self.collecting or round_id != self.round_id:
+                return  # round already ended
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0.05:
+                self.clock = None
+                self.collecting = False  # right here, an answer read after this is late even if the game thread hasnt woken up yet
+                self.round_done.set()
+                return
+            # next push lands on a multiple of TIMER_TICK (or on the deadline itself)
+            delay = remaining % TIMER_TICK or TIMER_TICK
+            self.clock = self.network.call_later(delay, self.clock_tick, round_id)
+
+        self.broadcast(str(math.ceil(remaining)), Kind.TIMER)
+
+    # blocks the game thread until handle_frame / remove_client / the deadline say the round is complete
+    def recieve_round_answers(self):
+        self.round_done.wait()
+        with self.lock:
+            self.collecting = False
+            # everyone answered before time ran out, the pending timer has nothing left to do
+            if self.clock is not None:
+                self.clock.cancel()
+                self.clock = None
+
+    # a player left / dropped, the round no longer waits for them. call with self.lock held
+    def stop_waiting(self, pid):
+        if self.collecting and pid in self.expected:
+            self.expected.discard(pid)
+            if not self.players.answers[pid]:
+                self.waiting -= 1
+                if self.waiting <= 0:
+                    self.round_done.set()
+
+#===================================================================================================================================
+    # updates the scores and returns the feedback for each player {client_socket: encoded FEEDBACK frame}
+    # feedback isnt sent here, it goes out together with the scoreboard (see broadcast)
+    # it ends with the player's rank, so the scoreboard itself only needs the top of the table
+    # reads the player table's columns: only the ids that answered, in the order they answered
+    # (big rooms do the math with NumPy if it is installed, same results)
+    def grade_round(self, n_file_q):
+        correct_option = self.questions[n_file_q]["correct_option"]
+        correct = ord(correct_option)
+        table = self.players
+        names, answers = table.names, table.answers
+        vector = self.vector_grading and NumpyGrading.enabled(len(table))
+
+        # {id: points added} 1 for a right answer, the first one also gets 1 per other player.
+        # an answer sent before a drop still counts, one from someone who left is 0 by now.
+        # the bonus goes to the earliest arrival stamp (taken by the network loop right after the
+        # recv() that read the answer, see handle_frame)
+        if vector:
+            gained, first_correct = NumpyGrading.round_points(table, correct, len(table) - 1)
+        else:
+            gained = {pid: 1 for pid in table.answer_order if answers[pid] == correct}
+            first_correct = min(gained, key=table.answered_at.__getitem__, default=None)
+            if first_correct is not None:
+                gained[first_correct] += len(table) - 1
+
+        # the whole round in one sorted update, not one per player
+        changes = [(names[pid], points) for pid, points in gained.items()]
+        self.scores.add_many(changes)
+        self.all_time_scores.add_many(changes)
+
+        if self.game_id is not None:
+            asked, answered_at = self.asked_at, table.answered_at
+            rows = [(names[pid], chr(answers[pid]), pid in gained, gained.get(pid, 0), answered_at[pid] - asked)
+                    for pid in table.answer_order if answers[pid]]
+            rows += [(names[pid], None, False, 0, None) for pid in table.ids.values() if not answers[pid]]
+            self.round_rows = rows
+
+        # ranks only after everyone's points are in (away players get theirs when they resume).
+        # players with the same kind of message, rank and points get the very same bytes, so each
+        # different feedback is rendered once (with all the ties, a big room only has a few hundred)
+        messages = {FIRST: f"You were the first to answer correctly! You got {gained.get(first_correct)} points!",
+                    RIGHT: "Correct Answer! You got 1 point!",
+                    WRONG: f"Your Answer is wrong, the correct answer is {correct_option}",
+                    LATE: f"Time is up! the correct answer is {correct_option}"}  # only when the deadline closed the round
+        of = len(self.scores)
+
+        def render(kind, rank, score, added_points):
+            return encode_frame(Kind.FEEDBACK, f"{messages[kind]}\nYou are #{rank} of {of} with {score} points (+{added_points})")
+
+        if vector:
+            return NumpyGrading.feedback(table, self.scores, gained, first_correct, render)
+
+        ranks, scores = self.scores.ranks(), self.scores.points  # every rank from one walk over the board
+        rendered = {}  # {(kind, rank, points added): frame}
+        frames = {}
+        for s, pid in table.ids.items():
+            added_points = gained.get(pid, 0)
+            if pid == first_correct:
+                kind = FIRST
+            elif added_points:
+                kind = RIGHT
+            else:
+                kind = WRONG if answers[pid] else LATE
+            username = names[pid]
+            key = (kind, ranks[username], added_points)
+            frame = rendered.get(key)
+            if frame is None:
+                frame = rendered[key] = render(kind, key[1], scores[username], added_points)
+            frames[s] = frame
+
+        return frames
+
+#===================================================================================================================================
+    def end_game(self):
+        self.broadcast("Game ended. Bye Bye")
+        self.remove_all("was removed")
+        with self.lock:
+            # nothing left to come back to
+            for pid, timer in self.away.items():
+                timer.cancel()
+                self.metrics.answer_latency.remove(self.latency_label(self.players.forget(pid)))
+            self.away.clear()
+            self.sessions.clear()
+            self.current_question = None
+        self.game_started = False
+        self.game_ended = False
+        self.accepting_clients = True
+        self.log_message("a new game can be started if u want")
+        self.host.room_finished(self)
+
+#==================================================================================================================================
+    # runs a whole game on a pool thread, traced / profiled if the host asks for it
+    def start_game(self, n_questions, time_limit=None):
+        self.tracer = Tracer(f"room {self.code}") if self.host.trace_dir else NO_TRACE
+        profiler = cProfile.Profile() if self.host.profile else None
+        if profiler is not None:
+            profiler.enable()  # only sees this thread, which is what we want
+        try:
+            self.play_game(n_questions, time_limit)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self.dump_trace(profiler)
+            self.tracer = NO_TRACE
+            self.game_id = None
+
+    # runs a ResultsStore write, a broken database is logged but never stops the game
+    def store(self, write, *args):
+        try:
+            return write(*args)
+        except sqlite3.Error as e:
+            self.log_message(f"could not save results: {e}", WARNING)
+            return None
+
+    def dump_trace(self, profiler):
+        if not self.tracer.enabled and profiler is None:
+            return
+        folder = self.host.trace_dir or "."
+        name = os.path.join(folder, f"{self.code}-{time.strftime('%Y%m%d-%H%M%S')}")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            if self.tracer.enabled:
+                self.tracer.write(name + ".trace.json")
+                self.log_message(f"trace written to {name}.trace.json")
+            if profiler is not None:
+                profiler.dump_stats(name + ".prof")
+                self.log_message(f"profile written to {name}.prof")
+        except OSError as e:
+            self.log_message(f"could not write trace: {e}", WARNING)
+
+    def play_game(self, n_questions, time_limit=None):
+
+        try:
+            self.n_questions = n_questions
+            self.time_limit = time_limit
+            self.all_time_scores = Scoreboard()
+            self.round_stats = []
+            self.metrics.games.inc()
+            self.game_started = True
+            self.accepting_clients = False
+            self.log_message("===== STARTING GAME! =====")
+            self.log_message(f"Players: {list(self.players.values())}")
+            self.log_message(f"Questions to use: {self.n_questions}")
+            if self.time_limit:
+                self.log_message(f"Time per question: {self.time_limit:g}s")
+
+            results = self.host.results
+            if results is not None:
+                self.game_id = self.store(results.start_game, self.code, os.path.basename(self.questions.filename),
+                                          self.n_questions, len(self.players))
+
+            #initialize players scores to 0
+            with self.lock:
+                for username in self.players.values():
+                    self.scores.set(username, 0)
+                    self.all_time_scores.set(username, 0)
+                board_frame = self.board.update(self.scores)
+
+
+            self.log_message(self.scoreboard(self.scores), DEBUG)
+            self.broadcast_frame(board_frame)
+
+
+            trace = self.tracer
+            for i in range(1, self.n_questions +1): # questions in game
+                n_file_q = ((i - 1)) % self.questions_in_file
+                self.stats.take() # start counting this round's writes from 0
+
+                self.open_round()
+                self.current_question = (n_file_q, i)
+                self.asked_at = time.perf_counter()  # answer times count from here, fan out included
+                with trace.span("question broadcast", round=i, players=len(self.players)):
+                    self.broadcast_frame(self.question_frame(n_file_q, i))
+                self.start_clock()
+                asked = time.perf_counter()
+
+
+                # here recieve answers from cients and add them to the player table (answers column)
+                with trace.span("answer wait", round=i):
+                    self.recieve_round_answers()
+                answered = time.perf_counter()
+                self.metrics.answer_wait.observe(answered - asked)
+                self.metrics.rounds.inc()
+
+                # grade round and siplay updated scoreboard when all answers are recieved (or time ran out)
+                graded = False
+                with trace.span("grading", round=i, answers=len(self.players.answer_order)):
+                    with self.lock:
+                        if self.players:
+                            feedback = self.grade_round(n_file_q) # the scores should be updated in this function
+                            board_frame = self.board.update(self.scores) # only what changed on the board, the same bytes for every player
+                            board = self.scoreboard(self.scores) # for the log
+                            graded = True
+                self.metrics.grading.observe(time.perf_counter() - answered)
+
+                if graded:
+                    # per round dumps are DEBUG so production logs only get the final results
+                    self.log_message(f"question {i} asked, scores so far:", DEBUG)
+                    self.log_message(board, DEBUG)
+                    with trace.span("scoreboard broadcast", round=i, players=len(self.players)):
+                        self.broadcast_frame(board_frame, feedback)
+                    # saved after the players have their scoreboard, one transaction for the round
+                    if self.game_id is not None:
+                        self.store(results.record_round, self.game_id, i, n_file_q, self.round_rows)
+
+                send_calls, bytes_sent = self.stats.take()
+                self.round_stats.append((send_calls, bytes_sent, len(self.players)))
+                self.log_message(f"round {i}: {send_calls} send syscalls, {bytes_sent} bytes for {len(self.players)} players", DEBUG)
+
+                # round answers are cleared before the next question by open_round (PlayerTable.new_round)
+
+                # if we are in the  last q display results:
+                if i == self.n_questions or len(self.players.keys()) < 1:
+                    self.log_message(self.display_results(self.all_time_scores))
+                    with self.lock:
+                        result_text = self.display_results(self.all_time_scores, BOARD_SIZE)
+                        final_rank = {s: encode_frame(Kind.FEEDBACK, "Game over! " + self.rank_line(self.all_time_scores, username))
+                                      for s, username in self.players.items()}
+                    with trace.span("results broadcast", players=len(self.players)):
+                        self.broadcast(result_text, Kind.RESULTS, final_rank)
+                    if self.game_id is not None:
+                        final = [(username, pts, rank) for rank, username, pts in self.all_time_scores.ranked()]
+                        self.store(results.finish_game, self.game_id, final)
+                    break
+            self.game_ended = True
+            if self.game_ended:
+                self.end_game()
+
+
+        except Exception as e:  # for log issues
+            self.log_message(f"ERROR in game: {e}", ERROR)
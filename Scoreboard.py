@@ -0,0 +1,92 @@
+from bisect import bisect_left, insort
+
+# scores kept sorted all the time, so nothing has to sort them again after a round.
+# the order list holds (-score, username): best score first, ties by name.
+# a score change is two bisects (+ a memmove of the list), a rank lookup is one bisect,
+# top k is a slice. not thread safe, the room uses it under its lock.
+
+
+class Scoreboard:
+    def __init__(self):
+        self.points = {}  # {username: score}
+        self.order = []   # sorted [(-score, username)]
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, username):
+        return username in self.points
+
+    def __getitem__(self, username):
+        return self.points[username]
+
+    def get(self, username, default=None):
+        return self.points.get(username, default)
+
+    # adds the player if it isnt there yet
+    def set(self, username, score):
+        old = self.points.get(username)
+        if old is not None:
+            del self.order[bisect_left(self.order, (-old, username))]
+        self.points[username] = score
+        insort(self.order, (-score, username))
+
+    def add(self, username, points):
+        self.set(username, self.points[username] + points)
+
+    # a whole round of [(username, points)]: a few changes are moved one by one, many of them
+    # are taken out, sorted on their own and merged back in one sort (two sorted runs, so
+    # timsort just merges them in linear time)
+    def add_many(self, changes):
+        if len(changes) * 16 < len(self.order):
+            for username, points in changes:
+                self.add(username, points)
+            return
+        scores = self.points
+        for username, points in changes:
+            scores[username] += points
+        changed = {username for username, _ in changes}
+        order = [entry for entry in self.order if entry[1] not in changed]
+        order += sorted([(-scores[username], username) for username in changed])
+        order.sort()
+        self.order = order
+
+    def remove(self, username):
+        old = self.points.pop(username, None)
+        if old is not None:
+            del self.order[bisect_left(self.order, (-old, username))]
+
+    # competition ranking: 1 + players with a strictly higher score (equal scores share a rank)
+    def rank(self, username):
+        return bisect_left(self.order, (-self.points[username],)) + 1
+
+    # {username: rank} for everyone in one walk over the order, cheaper than a rank() per player
+    def ranks(self):
+        result = {}
+        rank = 0
+        prev = None
+        for idx, (neg, username) in enumerate(self.order):
+            if neg != prev:
+                rank = idx + 1
+                prev = neg
+            result[username] = rank
+        return result
+
+    # [(username, score)] best first
+    def top(self, k):
+        return [(username, -neg) for neg, username in self.order[:k]]
+
+    def items(self):
+        return [(username, -neg) for neg, username in self.order]
+
+    # [(rank, username, score)] best first, for the first k players (all if k is None)
+    def ranked(self, k=None):
+        rows = []
+        rank = 0
+        prev_score = None
+        for idx, (neg, username) in enumerate(self.order if k is None else self.order[:k]):
+            if -neg != prev_score:
+                rank = idx + 1  # competition ranking jump
+                prev_score = -neg
+            rows.append((rank, username, -neg))
+        return rows
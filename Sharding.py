@@ -0,0 +1,231 @@
+import json
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from Protocol import encode_frame
+
+# one python process grades and serializes on one core, so Supervisor.py runs N worker processes
+# (each a normal headless server) on the same port. the kernel hands every new connection to
+# some worker, but a room only lives in one of them, so:
+#  - the supervisor keeps the room directory {room code: worker} and serves it on a unix socket
+#    (shard_dir/directory.sock). a room belongs to the worker its first player landed on, and is
+#    dropped from the directory when that worker closes the room
+#  - every worker listens on shard_dir/worker<i>.sock. a worker that accepted a player for a room
+#    owned by someone else sends the client socket over it (SCM_RIGHTS, socket.send_fds) together
+#    with the frames it already read, and forgets about it. the owner carries on with the
+#    handshake like it accepted the connection itself
+# every directory request is a blocking round trip to another process, so none of them run on
+# the network loop: the router does them on its own thread, one after the other in the order
+# they were asked (a room's "drop" is done before a later "owner" for the same code)
+# linux / macos only (unix sockets + fd passing).
+
+DIRECTORY = "directory.sock"
+HANDOFF_CHUNK = 65536
+
+
+def worker_path(shard_dir, worker):
+    return os.path.join(shard_dir, f"worker{worker}.sock")
+
+
+def unix_listener(path):
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(64)
+    return listener
+
+
+def serve_forever(listener, handler):
+    def loop():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                break  # closed
+            threading.Thread(target=handler, args=(conn,), daemon=True).start()
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+#===================================================================================================================================
+# DIRECTORY (supervisor): /////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+# json lines, one request one reply:
+#   {"op": "owner", "room": code, "worker": i} -> {"owner": j}   (j = i if nobody had the room)
+#   {"op": "drop", "room": code, "worker": i}  -> {"ok": true}    (only if i still owns it)
+#   {"op": "rooms"}                            -> {"rooms": {code: worker}}
+class RoomDirectory:
+    def __init__(self, shard_dir):
+        self.path = os.path.join(shard_dir, DIRECTORY)
+        self.owners = {}  # {room code: worker}
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def start(self):
+        self.listener = unix_listener(self.path)
+        serve_forever(self.listener, self.serve)
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+
+    def serve(self, conn):
+        with conn, conn.makefile("rwb") as f:
+            for line in f:
+                try:
+                    reply = self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    reply = {"error": "bad request"}
+                f.write(json.dumps(reply).encode() + b"\n")
+                f.flush()
+
+    def handle(self, request):
+        op = request["op"]
+        with self.lock:
+            if op == "owner":
+                return {"owner": self.owners.setdefault(request["room"], request["worker"])}
+            if op == "drop":
+                if self.owners.get(request["room"]) == request["worker"]:
+                    del self.owners[request["room"]]
+                return {"ok": True}
+            if op == "rooms":
+                return {"rooms": dict(self.owners)}
+        return {"error": f"unknown op {op}"}
+
+    # a worker died, returns the codes of the rooms it had
+    def forget_worker(self, worker):
+        with self.lock:
+            lost = sorted(code for code, owner in self.owners.items() if owner == worker)
+            for code in lost:
+                del self.owners[code]
+            return lost
+
+
+#===================================================================================================================================
+# ROUTER (every worker): //////////////////////////////////////////////////////////////////////////////////////////////////////////
+#===================================================================================================================================
+class ShardRouter:
+    def __init__(self, shard_dir, worker):
+        self.shard_dir = shard_dir
+        self.worker = worker
+        self.server = None
+        self.listener = None
+        self.lock = threading.Lock()  # one directory request at a time on the shared connection
+        self.conn = None
+        self.file = None
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shard-router")
+
+    # starts taking sockets handed over by the other workers
+    def start(self, server):
+        self.server = server
+        self.listener = unix_listener(worker_path(self.shard_dir, self.worker))
+        serve_forever(self.listener, self.receive)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        with self.lock:
+            if self.conn is not None:
+                self.file.close()
+                self.conn.close()
+                self.conn = None
+
+    # raises OSError if the supervisor is gone
+    def ask(self, request):
+        with self.lock:
+            if self.conn is None:
+                self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.conn.connect(os.path.join(self.shard_dir, DIRECTORY))
+                self.file = self.conn.makefile("rwb")
+            try:
+                self.file.write(json.dumps(request).encode() + b"\n")
+                self.file.flush()
+                line = self.file.readline()
+                if not line:
+                    raise ConnectionError("room directory closed")
+            except OSError:
+                self.file.close()
+                self.conn.close()
+                self.conn = None
+                raise
+        return json.loads(line)
+
+    # runs fn(*args) on the router's thread, after everything asked before it
+    def run(self, fn, *args):
+        try:
+            self.pool.submit(self.call, fn, args)
+        except RuntimeError:
+            pass  # closed, the server is stopping
+
+    @staticmethod
+    def call(fn, args):
+        try:
+            fn(*args)
+        except Exception:
+            traceback.print_exc()  # nobody waits on the future, dont lose it
+
+    # router thread: the worker that has the room, claims it for this worker if it is new.
+    # without a directory every worker just keeps the rooms it gets (better than no server)
+    def owner(self, room_code):
+        try:
+            return self.ask({"op": "owner", "room": room_code, "worker": self.worker})["owner"]
+        except (OSError, ValueError, KeyError) as e:
+            self.server.log_message(f"room directory unreachable ({e}), keeping room '{room_code}' here")
+            return self.worker
+
+    def room_closed(self, room_code):
+        self.run(self.drop, room_code)
+
+    def drop(self, room_code):
+        try:
+            self.ask({"op": "drop", "room": room_code, "worker": self.worker})
+        except (OSError, ValueError):
+            pass
+
+    # router thread: sends the client (and the frames already read from it) to the worker that owns its room.
+    # returns False if that didnt work (the caller turns the client away then)
+    def forward(self, worker, client_socket, client_address, frames, rest=b""):
+        header = json.dumps({"from": self.worker, "address": list(client_address[:2])}).encode() + b"\n"
+        data = header + b"".join(encode_frame(kind, payload) for kind, payload in frames) + rest
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as peer:
+                peer.connect(worker_path(self.shard_dir, worker))
+                sent = socket.send_fds(peer, [data[:HANDOFF_CHUNK]], [client_socket.fileno()])
+                if sent < len(data):
+                    peer.sendall(data[sent:])
+        except OSError as e:
+            self.server.log_message(f"could not hand {client_address[0]} over to worker {worker}: {e}")
+            return False
+        return True  # the other worker has its own copy of the fd now, the caller closes ours
+
+    # another worker sent us a client
+    def receive(self, conn):
+        with conn:
+            try:
+                data, fds, _, _ = socket.recv_fds(conn, HANDOFF_CHUNK, 1)
+            except OSError:
+                return
+            if not fds:
+                return
+            client_socket = socket.socket(fileno=fds[0])
+            chunks = [data]
+            try:
+                while True:
+                    chunk = conn.recv(HANDOFF_CHUNK)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+            except OSError:
+                client_socket.close()
+                return
+        header, _, handshake = b"".join(chunks).partition(b"\n")
+        address = tuple(json.loads(header)["address"])
+        self.server.adopt_client(client_socket, address, handshake)
@@ -0,0 +1,166 @@
+import argparse
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from Engine import LISTEN_BACKLOG
+from Headless import build_parser
+from Sharding import RoomDirectory
+
+# one headless server per core, all on the same port:
+#   python -m Supervisor --workers 4 --port 5000 --questions questions.txt --auto-start
+# every option the supervisor doesnt know is passed to the workers (python -m Headless --help).
+# the workers listen with SO_REUSEPORT (or, with --shared-socket, all accept on one listening
+# socket made here) and route players to the worker that has their room (Sharding.py).
+# a worker that dies is started again, its rooms are gone with it.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FAST_EXIT = 3.0  # a worker dying this soon after it started is a setup problem (bad option, port taken), not a crash
+
+
+def say(message):
+    print(f"{time.strftime('%H:%M:%S')} [supervisor] {message}", flush=True)
+
+
+class Supervisor:
+    def __init__(self, args, worker_args):
+        self.args = args
+        self.worker_args = worker_args
+        self.reuse_port = not args.shared_socket and hasattr(socket, "SO_REUSEPORT")
+        self.listener = None
+        self.port = None
+        self.shard_dir = None
+        self.directory = None
+        self.workers = {}  # {worker: (subprocess.Popen, time it started)}
+        self.stopped = threading.Event()
+
+    # raises OSError if the port cant be had
+    def start(self):
+        # with SO_REUSEPORT this socket is only bound, never listened on: it keeps the port (and
+        # turns port 0 into a real one) while workers come and go
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            if self.reuse_port:
+                self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.listener.bind((self.args.host, self.args.port))
+            if not self.reuse_port:
+                self.listener.listen(self.args.backlog)
+        except OSError:
+            self.listener.close()
+            raise
+        self.port = self.listener.getsockname()[1]
+
+        self.shard_dir = tempfile.mkdtemp(prefix="suquid-")
+        self.directory = RoomDirectory(self.shard_dir)
+        self.directory.start()
+        for worker in range(self.args.workers):
+            self.spawn(worker)
+
+    def command(self, worker):
+        args = self.args
+        cmd = [sys.executable, "-m", "Headless", *self.worker_args, "--host", args.host, "--port", str(self.port),
+               "--shard-dir", self.shard_dir, "--worker", str(worker)]
+        if self.reuse_port:
+            cmd.append("--reuse-port")
+        else:
+            cmd += ["--listen-fd", str(self.listener.fileno())]
+        if args.metrics_port is not None:
+            cmd += ["--metrics-port", str(args.metrics_port + worker)]
+        cmd += ["--backlog", str(args.backlog)]
+        if args.log_file:
+            cmd += ["--log-file", f"{args.log_file}.{worker}"]
+        return cmd
+
+    def spawn(self, worker):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (HERE, env.get("PYTHONPATH")) if p)
+        pass_fds = () if self.reuse_port else (self.listener.fileno(),)
+        process = subprocess.Popen(self.command(worker), env=env, pass_fds=pass_fds)
+        self.workers[worker] = (process, time.monotonic())
+
+    # returns the exit status for the supervisor
+    def watch(self):
+        while not self.stopped.wait(0.5):
+            for worker, (process, started) in list(self.workers.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                # its rooms went down with it, let their codes go to the others
+                lost = self.directory.forget_worker(worker)
+                if time.monotonic() - started < FAST_EXIT:
+                    say(f"worker {worker} exited with status {code} right after starting, stopping")
+                    return 1
+                say(f"worker {worker} exited with status {code} (rooms lost: {', '.join(lost) or 'none'}), starting it again")
+                self.spawn(worker)
+        return 0
+
+    def stop(self):
+        for process, _ in self.workers.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)  # workers shut down like on ctrl+c
+        deadline = time.monotonic() + 10.0
+        for process, _ in self.workers.values():
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        if self.directory is not None:
+            self.directory.close()
+        if self.shard_dir is not None:
+            shutil.rmtree(self.shard_dir, ignore_errors=True)
+        if self.listener is not None:
+            self.listener.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m Supervisor", description="SUquid Quiz server on several cores",
+                                     epilog="every other option is passed to the workers, see python -m Headless --help")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: one per core)")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on (default 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=5000, help="port to listen on (default 5000, 0 = any free port)")
+    parser.add_argument("--shared-socket", action="store_true",
+                        help="workers accept on one listening socket made here instead of each listening with SO_REUSEPORT")
+    parser.add_argument("--backlog", type=int, default=LISTEN_BACKLOG, help=f"listen backlog (default {LISTEN_BACKLOG})")
+    parser.add_argument("--metrics-port", type=int, help="worker i serves Prometheus metrics on PORT + i")
+    parser.add_argument("--log-file", help="worker i writes its json log to LOG_FILE.i")
+    args, worker_args = parser.parse_known_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # check the worker options once here instead of N workers failing the same way
+    worker_parser = build_parser()
+    worker_options = worker_parser.parse_args(worker_args)
+    if worker_options.auto_start and not worker_options.questions:
+        parser.error("--auto-start needs --questions")
+
+    supervisor = Supervisor(args, worker_args)
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stopped.set())
+    try:
+        supervisor.start()
+    except OSError as e:
+        print(f"Could not start server: {e}", file=sys.stderr)
+        supervisor.stop()
+        return 1
+
+    mode = "SO_REUSEPORT" if supervisor.reuse_port else "one shared socket"
+    say(f"{args.workers} workers on {args.host}:{supervisor.port} ({mode})")
+    status = 0
+    try:
+        status = supervisor.watch()
+    except KeyboardInterrupt:
+        pass  # the workers got the ctrl+c too
+    finally:
+        supervisor.stop()
+        say("stopped")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# opt in tracing for a game: spans for each phase of a round (question broadcast, answer wait,
+# grading, scoreboard broadcast) plus an instant event per player answer, written as Chrome trace
+# JSON (open it in chrome://tracing or https://ui.perfetto.dev).
+# rooms use NO_TRACE when tracing is off, its span() hands back one shared do-nothing object.
+
+MAX_EVENTS = 200000  # a huge game keeps its last events instead of eating all the memory
+
+
+class Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.tracer.add({"name": self.name, "ph": "X", "ts": self.tracer.micros(self.start),
+                         "dur": round((end - self.start) * 1e6, 3), "args": self.args})
+        return False
+
+
+class Tracer:
+    enabled = True
+
+    def __init__(self, name="game", max_events=MAX_EVENTS):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.events = deque(maxlen=max_events)
+        self.threads = {}  # {thread id: thread name} for the metadata events
+        self.pid = os.getpid()
+
+    def micros(self, t):
+        return round((t - self.origin) * 1e6, 3)
+
+    # deque.append is thread safe, so the game thread and the network thread can both record
+    def add(self, event):
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        event["pid"] = self.pid
+        event["tid"] = tid
+        self.events.append(event)
+
+    def span(self, name, **args):
+        return Span(self, name, args)
+
+    def instant(self, name, **args):
+        self.add({"name": name, "ph": "i", "s": "t", "ts": self.micros(time.perf_counter()), "args": args})
+
+    def write(self, path):
+        meta = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                for tid, name in list(self.threads.items())]
+        meta.append({"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": self.name}})
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": meta + list(self.events), "displayTimeUnit": "ms"}, file)
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullTracer:
+    enabled = False
+    _span = NullSpan()
+
+    def span(self, name, **args):
+        return self._span
+
+    def instant(self, name, **args):
+        pass
+
+
+NO_TRACE = NullTracer()
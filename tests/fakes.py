@@ -0,0 +1,87 @@
+from Metrics import ServerMetrics
+from Room import GameRoom
+
+# stand ins for the server around a room, shared by the tests and Benchmark.py: a host whose
+# network only counts what would be written, sockets that are just dict keys and a question bank
+# on disk.
+
+
+class FakeNetwork:
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def send(self, sock, *frames):
+        self.calls += 1
+        self.bytes += sum(len(f) for f in frames)
+
+    def close_client(self, sock):
+        pass
+
+    # the timer never fires by itself, a test calls fire() when the time has come
+    def call_later(self, delay, callback, *args):
+        return FakeTimer(delay, callback, args)
+
+
+class FakeTimer:
+    def __init__(self, delay, callback, args):
+        self.delay = delay
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fire(self):
+        if not self.cancelled:
+            self.callback(*self.args)
+
+
+class FakeHost:
+    def __init__(self):
+        self.network = FakeNetwork()
+        self.metrics = ServerMetrics()
+        self.trace_dir = None
+        self.profile = False
+        self.results = None
+        self.resume_grace = 0
+
+    def log_message(self, message, level=None, room=None):
+        pass
+
+    def room_changed(self, room):
+        pass
+
+    def room_finished(self, room):
+        pass
+
+
+# fake socket, only used as a dict key
+class FakeSocket:
+    __slots__ = ("n",)
+
+    def __init__(self, n):
+        self.n = n
+
+
+def write_bank(path, n_questions):
+    with open(path, "w", encoding="utf-8") as file:
+        for i in range(n_questions):
+            file.write(f"Question number {i}, what is the answer?\nA - first\nB - second\nC - third\nCorrect answer: {'ABC'[i % 3]}\n")
+
+
+# a room mid game with n players, everyone has answered the current round
+def make_room(n_players, bank, rng):
+    room = GameRoom(FakeHost(), "bench")
+    room.questions = bank
+    room.questions_in_file = len(bank)
+    for i in range(n_players):
+        sock = FakeSocket(i)
+        username = f"player{i}"
+        room.players.add(sock, username)
+        room.scores.set(username, rng.randrange(50))
+        room.all_time_scores.set(username, room.scores[username])
+    for pid in rng.sample(range(n_players), n_players):  # answers arrive in random order
+        room.players.answer(pid, rng.choice("ABC"), 0.0)
+    return room
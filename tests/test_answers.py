@@ -0,0 +1,55 @@
+import time
+import unittest
+
+from Protocol import Kind
+from Room import GameRoom
+from tests.fakes import FakeHost, FakeSocket
+
+# run from the repo root: python -m unittest discover tests (or python -m pytest tests)
+
+
+def room_with_players(n):
+    room = GameRoom(FakeHost(), "test")
+    sockets = [FakeSocket(i) for i in range(n)]
+    for i, sock in enumerate(sockets):
+        room.players.add(sock, f"player{i}")
+    room.open_round()
+    return room, sockets
+
+
+class AnswerTest(unittest.TestCase):
+    def test_second_answer_is_ignored(self):
+        room, sockets = room_with_players(5)
+        for _ in range(5):
+            room.handle_frame(sockets[0], Kind.ANSWER, "A", 1.0)
+        self.assertEqual(room.waiting, 4)
+        self.assertFalse(room.round_done.is_set())
+        self.assertEqual(room.players.answer_order, [0])
+
+    def test_nul_answer_counts_once(self):
+        room, sockets = room_with_players(5)
+        for _ in range(5):
+            room.handle_frame(sockets[0], Kind.ANSWER, "\x00", 1.0)
+        self.assertEqual(room.waiting, 4)
+        self.assertFalse(room.round_done.is_set())
+        self.assertEqual(room.players.answer_order, [0])
+        self.assertEqual(room.players.answers[0], ord("?"))
+
+    def test_non_ascii_answer_is_wrong(self):
+        room, sockets = room_with_players(2)
+        room.handle_frame(sockets[0], Kind.ANSWER, "é", 1.0)
+        room.handle_frame(sockets[0], Kind.ANSWER, "é", 2.0)
+        self.assertEqual(room.waiting, 1)
+        self.assertEqual(room.players.answers[0], ord("?"))
+
+    def test_answer_after_the_deadline_is_ignored(self):
+        room, sockets = room_with_players(2)
+        room.deadline = time.monotonic() - 1  # the clock ran out
+        room.clock_tick(room.round_id)
+        room.handle_frame(sockets[0], Kind.ANSWER, "A", 1.0)
+        self.assertTrue(room.round_done.is_set())
+        self.assertEqual(room.players.answer_order, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
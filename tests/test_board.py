@@ -0,0 +1,47 @@
+import unittest
+
+from BoardStream import APPLIED, GAP, STALE, BoardFeed, BoardModel, parse_board
+from Scoreboard import Scoreboard
+
+
+def payload(frame):
+    return frame[5:].decode("utf-8")  # past the frame header
+
+
+class BoardStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.scores = Scoreboard()
+        for name in ("a", "b", "c b"):
+            self.scores.set(name, 0)
+        self.feed = BoardFeed(2)
+
+    def test_deltas_follow_the_scores(self):
+        model = BoardModel()
+        self.assertEqual(model.apply(payload(self.feed.snapshot())), APPLIED)
+        for name, points in (("c b", 3), ("a", 5), ("b", 9)):
+            self.scores.add(name, points)
+            self.assertEqual(model.apply(payload(self.feed.update(self.scores))), APPLIED)
+        self.assertEqual(model.entries, {"b": (1, 9), "a": (2, 5)})
+        self.assertEqual(model.players, 3)
+
+    def test_gap_asks_once_then_snapshot_resyncs(self):
+        model = BoardModel()
+        model.apply(payload(self.feed.snapshot()))
+        self.scores.add("a", 1)
+        self.feed.update(self.scores)  # lost
+        self.scores.add("b", 2)
+        self.assertEqual(model.apply(payload(self.feed.update(self.scores))), GAP)
+        self.scores.add("c b", 3)
+        self.assertEqual(model.apply(payload(self.feed.update(self.scores))), STALE)
+        self.assertEqual(model.apply(payload(self.feed.snapshot())), APPLIED)
+        self.assertEqual(model.entries, {"c b": (1, 3), "b": (2, 2)})
+
+    def test_bad_entry_lines_are_skipped(self):
+        mode, seq, players, entries, removed = parse_board("D 4 3\n1 5 a\nb\nx y z\n- c")
+        self.assertEqual((mode, seq, players), ("D", 4, 3))
+        self.assertEqual(entries, {"a": (1, 5)})
+        self.assertEqual(removed, ["c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import os
+import tempfile
+import unittest
+
+from LogSink import LogSink
+
+
+class LogSinkTest(unittest.TestCase):
+    def test_failed_rotation_keeps_logging(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "log.jsonl")
+            os.mkdir(path + ".1")  # the file can never be renamed there
+            sink = LogSink(path=path, max_bytes=500, backups=1, flush_interval=60)
+            try:
+                for i in range(50):
+                    sink.log(f"line {i}")
+                    sink.flush()
+                self.assertTrue(sink.writer.is_alive())
+            finally:
+                sink.close()
+            with open(path, encoding="utf-8") as file:
+                self.assertEqual(sum(1 for _ in file), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import socket
+import threading
+import time
+import unittest
+
+from Network import NetworkCore
+from Protocol import Kind, encode_frame
+
+
+class Recorder:
+    def __init__(self, expected):
+        self.frames = []  # [(sock, kind, payload, arrived)]
+        self.expected = expected
+        self.done = threading.Event()
+
+    def handle_frame(self, sock, kind, payload, arrived):
+        self.frames.append((sock, kind, payload, arrived))
+        if len(self.frames) >= self.expected:
+            self.done.set()
+
+    def handle_disconnect(self, sock):
+        pass
+
+
+# gives the client away on its first frame, like Engine.admit does for a room in another worker
+class Taker:
+    def __init__(self, network):
+        self.network = network
+        self.taken = None  # (first frame, what take_client returned)
+        self.done = threading.Event()
+
+    def handle_frame(self, sock, kind, payload, arrived):
+        self.taken = ((kind, payload), self.network.take_client(sock))
+        self.done.set()
+
+    def handle_disconnect(self, sock):
+        pass
+
+
+class NetworkTest(unittest.TestCase):
+    def setUp(self):
+        self.network = NetworkCore()
+        self.pairs = []
+
+    def tearDown(self):
+        self.network.stop()
+        for ours, theirs in self.pairs:
+            ours.close()
+            theirs.close()
+
+    def test_answers_read_in_one_wakeup_get_their_own_stamps(self):
+        recorder = Recorder(4)
+        for _ in range(4):
+            ours, theirs = socket.socketpair()
+            self.pairs.append((ours, theirs))
+            theirs.sendall(encode_frame(Kind.ANSWER, "A"))  # all readable before the loop even starts
+            self.network.add_client(ours, recorder)
+        started = time.perf_counter()
+        self.network.start()
+        self.assertTrue(recorder.done.wait(2))
+        stamps = [arrived for _, _, _, arrived in recorder.frames]
+        self.assertEqual(len(set(stamps)), 4)
+        self.assertTrue(all(stamp >= started for stamp in stamps))
+
+    def test_frames_of_one_read_share_a_stamp(self):
+        recorder = Recorder(2)
+        ours, theirs = socket.socketpair()
+        self.pairs.append((ours, theirs))
+        theirs.sendall(encode_frame(Kind.ANSWER, "A") + encode_frame(Kind.ANSWER, "B"))
+        self.network.add_client(ours, recorder)
+        self.network.start()
+        self.assertTrue(recorder.done.wait(2))
+        self.assertEqual([payload for _, _, payload, _ in recorder.frames], ["A", "B"])
+        self.assertEqual(recorder.frames[0][3], recorder.frames[1][3])
+
+    def test_take_client_keeps_the_frames_read_after_the_first(self):
+        taker = Taker(self.network)
+        ours, theirs = socket.socketpair()
+        self.pairs.append((ours, theirs))
+        partial = encode_frame(Kind.ANSWER, "C")[:3]
+        theirs.sendall(encode_frame(Kind.JOIN, "room|alice") + encode_frame(Kind.ANSWER, "A")
+                       + encode_frame(Kind.RESYNC, "") + partial)
+        self.network.add_client(ours, taker)
+        self.network.start()
+        self.assertTrue(taker.done.wait(2))
+        first, (frames, decoder) = taker.taken
+        self.assertEqual(first, (Kind.JOIN, "room|alice"))
+        self.assertEqual(frames, [(Kind.ANSWER, "A"), (Kind.RESYNC, "")])
+        self.assertEqual(bytes(decoder.buffer), partial)
+        self.assertNotEqual(ours.fileno(), -1)  # still open, it's ours now
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import NumpyGrading
+from QuestionBank import build_bank
+from tests.fakes import make_room, write_bank
+
+# the NumPy path has to give exactly what the plain loop gives: same feedback frames for every
+# player, same scores and same rows for the results store. skipped without NumPy
+
+
+def play_round(room, rng):
+    # a fresh round: some players dont answer, answer times tie now and then
+    room.players.new_round()
+    for pid in rng.sample(sorted(room.players.ids.values()), len(room.players) * 3 // 4):
+        room.players.answer(pid, rng.choice("ABCx"), round(rng.uniform(0, 1), 2))
+
+
+@unittest.skipIf(NumpyGrading.np is None, "NumPy is not installed")
+class NumpyGradingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.folder.name, "questions.txt")
+        write_bank(path, 10)
+        cls.bank = build_bank(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def rooms(self, n, seed):
+        rooms = []
+        for vector in (False, True):
+            room = make_room(n, self.bank, random.Random(seed))
+            # players who left leave free rows behind, ids arent 0..n-1 any more
+            sockets = {sock.n: sock for sock in room.players.keys()}
+            for i in random.Random(seed + 1).sample(range(n), n // 10):
+                room.scores.remove(room.players.remove(sockets[i]))
+            room.vector_grading = vector
+            room.game_id = 1  # makes grade_round fill round_rows
+            rooms.append(room)
+        return rooms
+
+    def test_same_results_as_plain_loop(self):
+        with mock.patch.object(NumpyGrading, "MIN_PLAYERS", 1):
+            for n in (1, 2, 50, 1000):
+                for seed in range(3):
+                    plain, vector = self.rooms(n, seed)
+                    for question in range(4):
+                        for room in (plain, vector):
+                            play_round(room, random.Random(seed * 100 + question))
+                        expected = plain.grade_round(question)
+                        got = vector.grade_round(question)
+                        with self.subTest(players=n, seed=seed, question=question):
+                            self.assertEqual({s.n: f for s, f in got.items()}, {s.n: f for s, f in expected.items()})
+                            self.assertEqual(vector.scores.order, plain.scores.order)
+                            self.assertEqual(vector.all_time_scores.order, plain.all_time_scores.order)
+                            self.assertEqual(vector.round_rows, plain.round_rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
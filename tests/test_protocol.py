@@ -0,0 +1,48 @@
+import unittest
+
+from Protocol import HEADER, HEADER_SIZE, MAX_PAYLOAD, FrameDecoder, Kind, ProtocolError, encode_frame
+
+
+class FrameDecoderTest(unittest.TestCase):
+    def test_header_split_across_feeds(self):
+        decoder = FrameDecoder()
+        frame = encode_frame(Kind.ANSWER, "A")
+        for i in range(HEADER_SIZE - 1):
+            self.assertEqual(decoder.feed(frame[i:i + 1]), [])
+        self.assertEqual(decoder.feed(frame[HEADER_SIZE - 1:]), [(Kind.ANSWER, "A")])
+        self.assertEqual(decoder.buffer, b"")
+
+    def test_several_frames_in_one_chunk(self):
+        decoder = FrameDecoder()
+        data = encode_frame(Kind.JOIN, "room\nalice") + encode_frame(Kind.ANSWER, "B") + encode_frame(Kind.RESYNC, "")
+        self.assertEqual(decoder.feed(data), [(Kind.JOIN, "room\nalice"), (Kind.ANSWER, "B"), (Kind.RESYNC, "")])
+        self.assertEqual(decoder.buffer, b"")
+
+    def test_frame_split_across_feeds(self):
+        decoder = FrameDecoder()
+        frame = encode_frame(Kind.QUESTION, "Question 1/3\n\nwhat is é?")
+        self.assertEqual(decoder.feed(frame[:HEADER_SIZE + 3]), [])
+        self.assertEqual(decoder.feed(frame[HEADER_SIZE + 3:-1]), [])
+        # the last byte comes with the start of the next frame
+        self.assertEqual(decoder.feed(frame[-1:] + encode_frame(Kind.TIMER, "5")[:2]),
+                         [(Kind.QUESTION, "Question 1/3\n\nwhat is é?")])
+        self.assertEqual(len(decoder.buffer), 2)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ProtocolError):
+            FrameDecoder().feed(HEADER.pack(200, 1) + b"x")
+
+    def test_oversize_length(self):
+        # refused as soon as the header is in, before waiting for a megabyte of payload
+        with self.assertRaises(ProtocolError):
+            FrameDecoder().feed(HEADER.pack(Kind.ANSWER, MAX_PAYLOAD + 1))
+        with self.assertRaises(ProtocolError):
+            encode_frame(Kind.ANSWER, b"x" * (MAX_PAYLOAD + 1))
+
+    def test_largest_frame_is_accepted(self):
+        decoder = FrameDecoder()
+        self.assertEqual(decoder.feed(encode_frame(Kind.INFO, "x" * MAX_PAYLOAD)), [(Kind.INFO, "x" * MAX_PAYLOAD)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from QuestionBank import SUFFIX, QuestionError, build_bank, parse_questions, read_header
+
+RECORD = "What is {0}?\nA - one\nB - two\nC - three\n{1}\n"
+
+
+def parse(text):
+    return list(parse_questions(io.StringIO(text), "test.txt"))
+
+
+class ParseTest(unittest.TestCase):
+    def test_answer_line_variants(self):
+        lines = ["Correct answer: A", "Correct: B", "Answer: C", "correct answer - a", "ANSWER=b.", "correct c"]
+        questions = parse("".join(RECORD.format(i, line) for i, line in enumerate(lines)))
+        self.assertEqual([correct for _, _, correct in questions], ["A", "B", "C", "A", "B", "C"])
+        self.assertEqual(questions[0], ("What is 0?", ["A - one", "B - two", "C - three"], "A"))
+
+    def test_missing_line_reports_where(self):
+        text = RECORD.format(0, "Correct: A") + "What is 1?\nA - one\nB - two\nCorrect: B\n" + RECORD.format(2, "Correct: C")
+        with self.assertRaises(QuestionError) as caught:
+            parse(text)
+        # the short record starts on line 6, its answer came on line 9; the record after it isnt blamed
+        self.assertIn("line 9", str(caught.exception))
+        self.assertIn("starting on line 6", str(caught.exception))
+
+    def test_bad_answer_line(self):
+        with self.assertRaises(QuestionError) as caught:
+            parse(RECORD.format(0, "Correct: D"))
+        self.assertIn("line 5", str(caught.exception))
+
+    def test_incomplete_last_question(self):
+        with self.assertRaises(QuestionError) as caught:
+            parse(RECORD.format(0, "Correct: A") + "What is 1?\nA - one\n")
+        self.assertIn("line 6", str(caught.exception))
+
+    def test_blank_lines_are_ignored(self):
+        text = "\n\n" + RECORD.format(0, "Correct: A") + "\n\n" + RECORD.format(1, "Correct: B") + "\n\n   \n"
+        self.assertEqual(len(parse(text)), 2)
+
+
+class SidecarTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "questions.txt")
+        self.sidecar = self.path + SUFFIX
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, text, mtime_ns=None):
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(text)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_built_once_then_mapped(self):
+        self.write(RECORD.format(0, "Correct: A") + RECORD.format(1, "Correct: B"))
+        bank = build_bank(self.path)
+        self.assertEqual(len(bank), 2)
+        self.assertEqual(bank[1]["correct_option"], "B")
+        self.assertTrue(os.path.exists(self.sidecar))
+
+        with mock.patch("QuestionBank.compile_bank") as compile_bank:
+            self.assertEqual(build_bank(self.path)[0]["question"], "What is 0?")
+        compile_bank.assert_not_called()
+
+    def test_touched_source_is_restamped_not_rebuilt(self):
+        self.write(RECORD.format(0, "Correct: A"), mtime_ns=1_000_000_000)
+        build_bank(self.path)
+        os.utime(self.path, ns=(2_000_000_000, 2_000_000_000))
+        with mock.patch("QuestionBank.compile_bank") as compile_bank:
+            bank = build_bank(self.path)
+        compile_bank.assert_not_called()
+        self.assertEqual(bank[0]["correct_option"], "A")
+        self.assertEqual(read_header(self.sidecar)[1], 2_000_000_000)
+
+    def test_edit_with_the_same_size_is_rebuilt(self):
+        self.write(RECORD.format(0, "Correct: A"), mtime_ns=1_000_000_000)
+        build_bank(self.path)
+        self.write(RECORD.format(0, "Correct: B"), mtime_ns=2_000_000_000)  # same size, the hash tells
+        self.assertEqual(build_bank(self.path)[0]["correct_option"], "B")
+
+    def test_edit_with_a_new_size_is_rebuilt(self):
+        self.write(RECORD.format(0, "Correct: A"), mtime_ns=1_000_000_000)
+        build_bank(self.path)
+        self.write(RECORD.format(0, "Correct: A") + RECORD.format(1, "Correct: C"), mtime_ns=1_000_000_000)
+        bank = build_bank(self.path)
+        self.assertEqual(len(bank), 2)
+        self.assertEqual(bank[1]["correct_option"], "C")
+
+    def test_read_only_folder_compiles_in_memory(self):
+        self.write(RECORD.format(0, "Correct: C"))
+        with mock.patch("QuestionBank.os.replace", side_effect=PermissionError("read only")):
+            bank = build_bank(self.path)
+        self.assertIsInstance(bank.buffer, bytes)
+        self.assertEqual(bank[0]["correct_option"], "C")
+        self.assertEqual(os.listdir(self.dir.name), ["questions.txt"])  # no sidecar, no tmp left behind
+
+    def test_broken_file_leaves_no_sidecar(self):
+        self.write(RECORD.format(0, "Correct: Z"))
+        with self.assertRaises(QuestionError):
+            build_bank(self.path)
+        self.assertEqual(os.listdir(self.dir.name), ["questions.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from ResultsStore import ResultsStore
+
+
+def noon(year, month, day):
+    return time.mktime((year, month, day, 12, 0, 0, 0, 0, -1))
+
+
+class ResultsStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = ResultsStore(os.path.join(self.dir.name, "results.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    # one whole game on the given day: final is [(player, score, rank)]
+    def play(self, bank, final, when=noon(2026, 10, 17)):
+        with mock.patch("ResultsStore.time.time", return_value=when):
+            game_id = self.store.start_game("room", bank, 1, len(final))
+            self.store.record_round(game_id, 1, 0, [(player, "A", score > 0, score, 1.5) for player, score, _ in final])
+            self.store.finish_game(game_id, final)
+        return game_id
+
+    def test_game_rows(self):
+        game_id = self.play("a.txt", [("ann", 3, 1), ("bob", 1, 2), ("cat", 1, 2)])
+        self.assertEqual(self.store.game_results(game_id), [("ann", 3, 1), ("bob", 1, 2), ("cat", 1, 2)])
+        room, bank, day, started, ended, questions, players = self.store.query(
+            "SELECT room, bank, day, started, ended, questions, players FROM games WHERE id = ?", (game_id,))[0]
+        self.assertEqual((room, bank, day, questions, players), ("room", "a.txt", "2026-10-17", 1, 3))
+        self.assertIsNotNone(ended)
+        answers = self.store.query("SELECT player, answer, correct, points, seconds FROM answers WHERE game_id = ? ORDER BY player",
+                                   (game_id,))
+        self.assertEqual(answers[0], ("ann", "A", 1, 3, 1.5))
+        self.assertEqual(len(answers), 3)
+
+    def test_leaderboards_add_up_per_bank_and_per_day(self):
+        self.play("a.txt", [("ann", 3, 1), ("bob", 1, 2)], noon(2026, 10, 17))
+        self.play("a.txt", [("bob", 5, 1), ("ann", 2, 2)], noon(2026, 10, 18))
+        self.play("b.txt", [("cat", 4, 1), ("ann", 1, 2)], noon(2026, 10, 18))
+
+        self.assertEqual(sorted(self.store.top_all_time()), [("ann", 6, 3), ("bob", 6, 2), ("cat", 4, 1)])  # ann and bob tie
+        self.assertEqual(self.store.top_all_time(k=3)[2], ("cat", 4, 1))
+        self.assertEqual(self.store.top_bank("a.txt"), [("bob", 6, 2), ("ann", 5, 2)])
+        self.assertEqual(self.store.top_bank("b.txt"), [("cat", 4, 1), ("ann", 1, 1)])
+        self.assertEqual(self.store.top_day("2026-10-17"), [("ann", 3, 1), ("bob", 1, 1)])
+        self.assertEqual(self.store.top_day("2026-10-18"), [("bob", 5, 1), ("cat", 4, 1), ("ann", 3, 2)])
+        self.assertEqual(self.store.top_day("2026-10-19"), [])
+        self.assertEqual(self.store.top_bank("a.txt", k=1), [("bob", 6, 2)])
+
+    def test_failed_game_leaves_no_totals(self):
+        with self.assertRaises(TypeError):
+            self.store.finish_game("no such game", [("ann", 3, 1)])  # SELECT finds nothing, rolled back
+        self.assertEqual(self.store.top_all_time(), [])
+        self.assertEqual(self.store.game_results("no such game"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
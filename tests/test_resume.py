@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+from Protocol import Kind
+from QuestionBank import load_bank
+from Room import GameRoom
+from tests.fakes import FakeHost, FakeSocket, write_bank
+
+
+# a room mid game with resume_grace on, players that joined the normal way (so they have tokens)
+def running_room(bank, n, grace=30):
+    host = FakeHost()
+    host.resume_grace = grace
+    room = GameRoom(host, "test")
+    sockets = [FakeSocket(i) for i in range(n)]
+    for i, sock in enumerate(sockets):
+        room.add_player(sock, f"player{i}")
+        room.scores.set(f"player{i}", 0)
+    room.game_started = True
+    room.questions = bank
+    room.questions_in_file = len(bank)
+    room.current_question = (0, 1)
+    room.open_round()
+    return room, sockets
+
+
+class ResumeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.dir.name, "questions.txt")
+        write_bank(path, 3)
+        cls.bank = load_bank(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir.cleanup()
+    def test_token_claims_the_old_row(self):
+        room, sockets = running_room(self.bank, 2)
+        room.remove_client(sockets[0], grace=True)
+        timer = room.away[0]
+        self.assertIsNone(room.claim_session("player0", "wrong token"))
+        self.assertIsNone(room.claim_session("player1", room.sessions["player0"]))  # someone else's token
+        self.assertEqual(room.claim_session("player0", room.sessions["player0"]), 0)
+        self.assertTrue(timer.cancelled)
+        self.assertNotIn(0, room.away)
+
+    def test_grace_expiry_forgets_the_player(self):
+        room, sockets = running_room(self.bank, 2)
+        token = room.sessions["player0"]
+        room.remove_client(sockets[0], grace=True)
+        self.assertIn("player0", room.scores)  # away, not gone
+        room.away[0].fire()
+        self.assertNotIn("player0", room.scores)
+        self.assertNotIn("player0", room.sessions)
+        self.assertIsNone(room.claim_session("player0", token))
+
+    def test_no_grace_outside_a_game(self):
+        room, sockets = running_room(self.bank, 2)
+        room.game_started = False
+        room.remove_client(sockets[0], grace=True)
+        self.assertFalse(room.away)
+        self.assertNotIn("player0", room.sessions)
+
+    def test_answer_sent_before_the_drop_still_counts(self):
+        room, sockets = running_room(self.bank, 3)
+        room.handle_frame(sockets[0], Kind.ANSWER, "B", 1.0)
+        room.remove_client(sockets[0], grace=True)
+        pid = room.claim_session("player0", room.sessions["player0"])
+        new_socket = FakeSocket(10)
+        room.resume_player(new_socket, pid)
+        self.assertEqual(room.players.answers[pid], ord("B"))
+        self.assertEqual(room.waiting, 2)  # not asked again
+        room.handle_frame(new_socket, Kind.ANSWER, "C", 2.0)
+        self.assertEqual(room.players.answers[pid], ord("B"))  # and it can't be changed
+
+    def test_unanswered_player_is_waited_for_again(self):
+        room, sockets = running_room(self.bank, 3)
+        room.remove_client(sockets[0], grace=True)
+        self.assertEqual(room.waiting, 2)  # the round doesnt wait while they are away
+        pid = room.claim_session("player0", room.sessions["player0"])
+        new_socket = FakeSocket(10)
+        room.resume_player(new_socket, pid)
+        self.assertEqual(room.waiting, 3)
+        room.handle_frame(new_socket, Kind.ANSWER, "A", 2.0)
+        self.assertEqual(room.players.answers[pid], ord("A"))
+        self.assertEqual(room.waiting, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from Room import GameRoom
+from tests.fakes import FakeHost, FakeSocket
+
+
+def room_with_players(n):
+    room = GameRoom(FakeHost(), "test")
+    for i in range(n):
+        room.players.add(FakeSocket(i), f"player{i}")
+        room.scores.set(f"player{i}", 0)
+    room.game_started = True
+    return room
+
+
+class TeardownTest(unittest.TestCase):
+    def test_end_game_sends_one_goodbye_per_player(self):
+        room = room_with_players(500)
+        room.end_game()
+        self.assertEqual(room.network.calls, 500)  # "Game ended", no "player X left" to everyone
+        self.assertEqual(len(room.players), 0)
+        self.assertEqual(len(room.scores), 0)
+        self.assertFalse(room.sessions)
+
+    def test_leaving_one_by_one_is_still_announced(self):
+        room = room_with_players(3)
+        room.remove_client(FakeSocket(99))  # not in the room, nothing happens
+        self.assertEqual(room.network.calls, 0)
+        room.remove_client(next(iter(room.players)), "left")
+        self.assertEqual(room.network.calls, 2)  # the two still there hear about it
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import random
+import unittest
+
+from Scoreboard import Scoreboard
+
+
+def board(scores):
+    scoreboard = Scoreboard()
+    for username, score in scores.items():
+        scoreboard.set(username, score)
+    return scoreboard
+
+
+# what the board should say, worked out the slow way
+def expected_order(scores):
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+class ScoreboardTest(unittest.TestCase):
+    def test_equal_scores_share_a_rank(self):
+        scoreboard = board({"ann": 3, "bob": 5, "cat": 3, "dan": 1})
+        self.assertEqual([scoreboard.rank(u) for u in ("bob", "ann", "cat", "dan")], [1, 2, 2, 4])
+        self.assertEqual(scoreboard.ranks(), {"bob": 1, "ann": 2, "cat": 2, "dan": 4})
+
+    def test_top_breaks_ties_by_name(self):
+        scoreboard = board({"zed": 2, "amy": 2, "kim": 7, "bea": 2, "lou": 0})
+        self.assertEqual(scoreboard.top(3), [("kim", 7), ("amy", 2), ("bea", 2)])
+        self.assertEqual(scoreboard.ranked(4), [(1, "kim", 7), (2, "amy", 2), (2, "bea", 2), (2, "zed", 2)])
+        self.assertEqual(scoreboard.ranked()[-1], (5, "lou", 0))
+
+    def test_set_and_remove_keep_the_order(self):
+        scoreboard = board({"ann": 1, "bob": 2})
+        scoreboard.set("ann", 4)
+        scoreboard.remove("bob")
+        scoreboard.remove("nobody")
+        self.assertEqual(scoreboard.items(), [("ann", 4)])
+        self.assertEqual(len(scoreboard), 1)
+        self.assertNotIn("bob", scoreboard)
+
+    def test_add_many_matches_one_by_one(self):
+        rng = random.Random(7)
+        # a few changes (moved one by one) and a whole round (merged in one sort)
+        for n_changes in (3, 400):
+            scores = {f"p{i}": rng.randrange(10) for i in range(500)}
+            scoreboard = board(scores)
+            changes = [(f"p{i}", rng.randrange(1, 4)) for i in rng.sample(range(500), n_changes)]
+            scoreboard.add_many(changes)
+            for username, points in changes:
+                scores[username] += points
+            self.assertEqual(scoreboard.items(), expected_order(scores))
+            self.assertEqual(scoreboard.ranks(), {u: scoreboard.rank(u) for u in scores})
+
+
+if __name__ == "__main__":
+    unittest.main()